@@ -1,68 +1,127 @@
+import hashlib
 import json
+import os
+from collections.abc import Sequence
 from pprint import pprint
+from types import MappingProxyType
 from player import *
 
 ACTION_TYPES = ['add', 'redistribute', 'special']
 SOURCE_HANDS = [0, 1]  # index of player's hands
 TARGET_HANDS = [0, 1, 2, 3]  # 0/1 for own hands, 2/3 for opponent hands
 
+# next to this module, so the catalog check does not depend on the caller's working directory
+ACTIONS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'actions.json')
+
+# Actions are interned: Action(...) with the same fields always returns the same
+# immutable instance, with its hash computed once. Catalog actions also carry
+# their id, and game.py binds each one to an effect handler on first use.
+_INTERNED = {}
+
+def _action_key(action_type, source, targets, params):
+    params = tuple(sorted((k, tuple(v) if isinstance(v, list) else v) for k, v in params.items()))
+    return (action_type, source, tuple(targets), params)
+
 class Action:
-    def __init__(self, action_type, source=None, targets=None, params=None):
-        self.action_type = action_type
-        self.source = source
-        self.targets = targets or []
-        self.params = params or {}
+    __slots__ = ('action_type', 'source', 'targets', 'params', '_key', '_hash', 'id', 'effect')
+
+    def __new__(cls, action_type, source=None, targets=None, params=None):
+        key = _action_key(action_type, source, targets or (), params or {})
+        action = _INTERNED.get(key)
+        if action is None:
+            action = object.__new__(cls)
+            set_field = object.__setattr__
+            set_field(action, 'action_type', action_type)
+            set_field(action, 'source', source)
+            set_field(action, 'targets', key[2])
+            set_field(action, 'params', MappingProxyType(dict(key[3])))
+            set_field(action, '_key', key)
+            set_field(action, '_hash', hash(key))
+            # id in the loaded catalog, effect handler bound by game.py
+            set_field(action, 'id', None)
+            set_field(action, 'effect', None)
+            _INTERNED[key] = action
+        return action
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Action is immutable")
+
+    def __reduce__(self):
+        data = self.to_dict()
+        return (Action, (data['action_type'], data['source'], data['targets'], data['params']))
 
     def to_dict(self):
         return {
             'action_type': self.action_type,
             'source': self.source,
-            'targets': self.targets,
-            'params': self.params,
+            'targets': list(self.targets),
+            'params': {k: list(v) if isinstance(v, tuple) else v for k, v in self.params.items()},
         }
 
     def __eq__(self, other):
-        def normalize_params(p):
-            return {k: tuple(v) if isinstance(v, list) else v for k, v in p.items()}
-
-        return (
-            self.action_type == other.action_type and
-            self.source == other.source and
-            self.targets == other.targets and
-            normalize_params(self.params) == normalize_params(other.params)
-        )
+        return self is other or (isinstance(other, Action) and self._key == other._key)
 
     def __hash__(self):
-        # Convert any list values in params to tuples for hashing
-        hashable_params = frozenset(
-            (k, tuple(v) if isinstance(v, list) else v)
-            for k, v in self.params.items()
-        )
-        return hash((self.action_type, self.source, tuple(self.targets), hashable_params))
+        return self._hash
 
     def __repr__(self):
-        return f"Action({self.action_type}, src={self.source}, tgt={self.targets}, params={self.params})"
+        data = self.to_dict()
+        return f"Action({self.action_type}, src={self.source}, tgt={data['targets']}, params={data['params']})"
     
 
-ALL_ACTIONS = []
-ACTION_TO_ID = {}
-ID_TO_ACTION = {}
+# The action catalog is loaded (or generated) once per process. ALL_ACTIONS,
+# ACTION_TO_ID and ID_TO_ACTION are read-only views of it, and catalog_version()
+# is a hash of its content that Q-tables and other artifacts record so a table
+# trained against different action ids is refused.
 
-def generate_all_possible_actions():
-    ALL_ACTIONS.clear()
-    ACTION_TO_ID.clear()
-    ID_TO_ACTION.clear()
+class _ReadOnlyList(Sequence):
+    __slots__ = ('_items',)
 
-    idx = 0
+    def __init__(self, items):
+        self._items = items
+
+    def __getitem__(self, index):
+        return self._items[index]
+
+    def __len__(self):
+        return len(self._items)
+
+    def __repr__(self):
+        return repr(self._items)
+
+_ALL_ACTIONS = []
+_ACTION_TO_ID = {}
+_ID_TO_ACTION = {}
+_CATALOG = {'version': None}
+
+ALL_ACTIONS = _ReadOnlyList(_ALL_ACTIONS)
+ACTION_TO_ID = MappingProxyType(_ACTION_TO_ID)
+ID_TO_ACTION = MappingProxyType(_ID_TO_ACTION)
+
+def catalog_hash(action_dicts):
+    # content hash of the catalog in id order, independent of json formatting
+    encoded = json.dumps(list(action_dicts), sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(encoded.encode()).hexdigest()[:16]
+
+def _install(actions, version):
+    _ALL_ACTIONS.clear()
+    _ACTION_TO_ID.clear()
+    _ID_TO_ACTION.clear()
+    for idx, action in enumerate(actions):
+        _ALL_ACTIONS.append(action)
+        _ACTION_TO_ID[action] = idx
+        _ID_TO_ACTION[idx] = action
+        object.__setattr__(action, 'id', idx)
+    _CATALOG['version'] = version
+
+def build_action_catalog():
+    # the generated catalog in id order; nothing is registered or written
+    actions = []
 
     # -- ADD actions --
     for src in SOURCE_HANDS:
         for target in [2,3]:
-            action = Action('add', source=src, targets=[target])
-            ALL_ACTIONS.append(action)
-            ACTION_TO_ID[action] = idx
-            ID_TO_ACTION[idx] = action
-            idx += 1
+            actions.append(Action('add', source=src, targets=[target]))
 
     # -- REDISTRIBUTE actions --
     for total in range(2,9):
@@ -72,19 +131,12 @@ def generate_all_possible_actions():
             if val1 <= 5 and val2 <= 5:
                 params = {'values': sorted([val1, val2])}
                 action = Action('redistribute', source=None, targets=[], params=params)
-                if action not in ACTION_TO_ID:
-                    ALL_ACTIONS.append(action)
-                    ACTION_TO_ID[action] = idx
-                    ID_TO_ACTION[idx] = action
-                    idx += 1
+                if action not in actions:
+                    actions.append(action)
 
     # -- SWITCH actions --
     for src in SOURCE_HANDS:
-        action = Action('switch', source=src)
-        ALL_ACTIONS.append(action)
-        ACTION_TO_ID[action] = idx
-        ID_TO_ACTION[idx] = action
-        idx += 1
+        actions.append(Action('switch', source=src))
 
     # -- SPECIAL actions --
     SINGLE_TARGET_SPECIAL = ['plumb', 'scissors', 'paper', 'rock']
@@ -93,11 +145,7 @@ def generate_all_possible_actions():
             if tgt == src:
                 continue
             for special in SINGLE_TARGET_SPECIAL:
-                action = Action('special', source=src, targets=[tgt], params={'ability': special})
-                ALL_ACTIONS.append(action)
-                ACTION_TO_ID[action] = idx
-                ID_TO_ACTION[idx] = action
-                idx += 1
+                actions.append(Action('special', source=src, targets=[tgt], params={'ability': special}))
     MULTI_TARGET_SPECIAL = ['scissors_plumb', '3_scissors']
     for src in SOURCE_HANDS:
         # all combinations of 2 other hands:
@@ -106,23 +154,20 @@ def generate_all_possible_actions():
             for j in range(i + 1, len(other_hands)):
                 targets = [other_hands[i], other_hands[j]]
                 for special in MULTI_TARGET_SPECIAL:
-                    action = Action('special', source=src, targets=targets, params={'ability': special})
-                    ALL_ACTIONS.append(action)
-                    ACTION_TO_ID[action] = idx
-                    ID_TO_ACTION[idx] = action
-                    idx += 1
+                    actions.append(Action('special', source=src, targets=targets, params={'ability': special}))
 
     # -- CHOOSE FORM actions --
     for src in SOURCE_HANDS:
         for form in [0,1]:
-            action = Action('form', source=src, params={'form': form})
-            ALL_ACTIONS.append(action)
-            ACTION_TO_ID[action] = idx
-            ID_TO_ACTION[idx] = action
-            idx += 1
+            actions.append(Action('form', source=src, params={'form': form}))
+    return actions
+
+def generate_all_possible_actions():
+    actions = build_action_catalog()
+    _install(actions, catalog_hash(action.to_dict() for action in actions))
     save_actions_to_file()
 
-def save_actions_to_file(filename="actions.json"):
+def save_actions_to_file(filename=ACTIONS_FILE):
     data = {
         "actions": [action.to_dict() for action in ALL_ACTIONS],
         "action_to_id": {str(idx): ACTION_TO_ID[action] for idx, action in enumerate(ALL_ACTIONS)},
@@ -132,20 +177,38 @@ def save_actions_to_file(filename="actions.json"):
     with open(filename, 'w') as f:
         json.dump(data, f, indent=2)
 
-def load_actions_from_file(filename="actions.json"):
+def load_actions_from_file(filename=ACTIONS_FILE):
+    # no-op once a catalog is loaded; the file must match generate_all_possible_actions
+    if _CATALOG['version'] is not None:
+        return
+    generated = build_action_catalog()
+    expected = catalog_hash(action.to_dict() for action in generated)
+    if not os.path.exists(filename):
+        _install(generated, expected)
+        return
+
     with open(filename, 'r') as f:
         data = json.load(f)
+    entries = [action_data for _, action_data in sorted(data["id_to_action"].items(), key=lambda item: int(item[0]))]
+    version = catalog_hash(entries)
+    if version != expected or [int(idx) for idx in data["id_to_action"]] != list(range(len(entries))):
+        raise ValueError(f"{filename} (catalog {version}) does not match the generated action catalog ({expected})")
+    _install([Action(**action_data) for action_data in entries], version)
 
-    for idx_str, action_data in data["id_to_action"].items():
-        idx = int(idx_str)
-        action = Action(**action_data)
-        ALL_ACTIONS.append(action)
-        ACTION_TO_ID[action] = idx
-        ID_TO_ACTION[idx] = action
+def catalog_version():
+    load_actions_from_file()
+    return _CATALOG['version']
 
 
 def get_valid_actions(curPlayer: Player, opponentPlayer: Player):
+    # the catalog is only read on the first call
     load_actions_from_file()
+    valid_actions = list_valid_actions(curPlayer, opponentPlayer)
+    encoded_valid_actions = [action_to_id(action) for action in valid_actions]
+    return {'actions': valid_actions, 'encoded': encoded_valid_actions}
+
+def list_valid_actions(curPlayer: Player, opponentPlayer: Player):
+    # Same rules as get_valid_actions, without reloading the action file or encoding
     valid_actions = []
 
     curHands = curPlayer.get_hands()
@@ -183,8 +246,7 @@ def get_valid_actions(curPlayer: Player, opponentPlayer: Player):
                 params = {'values': sorted([val1, val2])}
                 valid_actions.append(Action('redistribute', source=None, targets=[], params=params))
 
-    encoded_valid_actions = [action_to_id(action) for action in valid_actions]
-    return {'actions': valid_actions, 'encoded': encoded_valid_actions}
+    return valid_actions
 
 def valid_actions_one_hand(hand, other_hand, opp_left, opp_right, source_index):
     valid_actions = []
@@ -286,6 +348,8 @@ def hand_requires_state(hand):
 
 # encoding
 def action_to_id(action):
+    if action.id is not None:
+        return action.id
     return ACTION_TO_ID[action]
 
 # decoding
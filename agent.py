@@ -1,21 +1,81 @@
+import heapq
 import random
 import pickle
 import os
+import time
 import pprint
 
+import numpy as np
+
 from player import *
 from game import *
+from legal_moves import *
+from q_tables import *
+from checkpoint import *
+from metrics import *
+from opponent_model import *
+from symmetry import *
+from opponents import *
+from trajectory import *
+from replay_buffer import *
 
 class Agent():
-    def __init__(self, alpha=0.1, gamma=0.95, epsilon=0.1, verbose = False, q_table_src='q_table.pkl'):
-        self.Q = {}  # Q[(state_tuple, action_id)] = value
+    def __init__(self, alpha=0.1, gamma=0.95, epsilon=0.1, verbose = False, q_table_src='q_table.pkl', q_backend='dict',
+                 checkpoint_mode='full', compact_every=50, lazy_load=False, metrics=None, update_mode='sample',
+                 symmetric=False, recorder=None, replay=None):
+        # q_backend 'dict': Q[(state_tuple, action_id)] = value
+        # q_backend 'dense': DenseQTable, same keys backed by a float32 array
+        self.q_backend = q_backend
+        # state_index[player][state] = {action_id: value}, built on first query (dict backend)
+        self.state_index = None
+        self._Q = None
         self.epsilon = epsilon
         self.alpha = alpha # learning rate
         self.gamma = gamma # discount factor
         self.verbose = verbose
         self.q_table_src = q_table_src
-        self.load_q_table()
-
+        # moves applied by play_episode, for both players
+        self.total_steps = 0
+        # optional TrainingMetrics; None keeps timers and counters out of the training loop
+        self.metrics = metrics
+        # optional TrajectoryRecorder, gets one record per move played in training
+        self.recorder = recorder
+        # optional ReplayBuffer: transitions are stored instead of applied, and Q is
+        # updated in vectorized minibatches from the buffer (dense backend only)
+        if replay is not None and (q_backend != 'dense' or update_mode != 'sample'):
+            raise ValueError("Replay needs q_backend='dense' and update_mode='sample'")
+        self.replay = replay
+        # optional CompiledPolicy used for greedy moves (see compile_policy); dropped on any Q write
+        self.compiled_policy = None
+        # update_mode 'sample' backs up one random opponent reply per update,
+        # 'expected' averages over every reply of the uniform random opponent
+        if update_mode not in ('sample', 'expected'):
+            raise ValueError(f"Unknown update mode: {update_mode}")
+        self.update_mode = update_mode
+        # symmetric=True stores only left/right-canonical states (see symmetry.py);
+        # every Q read and write maps the state and action id first
+        self.symmetric = symmetric
+        # when set to a dict, counts writes per (state, action_id) key (used by parallel training)
+        self.visit_counts = None
+        # checkpoint_mode 'full' pickles the whole table on every save,
+        # 'incremental' appends changed entries to q_table_src + '.log' and
+        # rewrites the snapshot every compact_every saves
+        if checkpoint_mode not in ('full', 'incremental'):
+            raise ValueError(f"Unknown checkpoint mode: {checkpoint_mode}")
+        self.checkpoint_mode = checkpoint_mode
+        self.compact_every = compact_every
+        self.checkpoint_log = None
+        self.dirty_keys = None
+        if checkpoint_mode == 'incremental' and q_table_src is not None:
+            self.checkpoint_log = QCheckpointLog(q_table_src, symmetric=symmetric)
+            self.dirty_keys = set()
+        # lazy_load defers reading q_table_src until self.Q is first used and skips the
+        # top/bottom move report (call show_summary() for it)
+        self.lazy_load = lazy_load
+        self.load_seconds = None
+        if not lazy_load:
+            self.Q = make_q_table(q_backend)
+            self.load_q_table()
 
 
     def select_action(self, state, valid_action_ids):
@@ -24,103 +84,203 @@ class Agent():
             self.verbose_print('CHOSING RANDOM ACTION')
             return random.choice(valid_action_ids)
 
+        if self.compiled_policy is not None:
+            # compiled over the full legal move lists: a caller restricting the choices, or a
+            # loaded policy that disagrees with them, falls back to the Q values below
+            action_id = self.compiled_policy.select_action(state, valid_action_ids)
+            if action_id in valid_action_ids:
+                return action_id
+
         # Choose best Q-value
-        q_vals = [self.Q.get((state, a), 0.0) for a in valid_action_ids]
+        q_vals = self.q_values(state, valid_action_ids)
         max_q = max(q_vals)
         best_actions = [a for a, q in zip(valid_action_ids, q_vals) if q == max_q]
         return random.choice(best_actions)
     
+    def select_actions(self, states, legal_masks=None, epsilon=None, rng=None):
+        # Batched select_action: epsilon-greedy over each row's legal actions with uniform
+        # tie-breaking. states are state tuples or engine state indices, legal_masks is a
+        # (len(states), num_actions) bool array (defaults to the get_valid_actions rules).
+        # Returns an array of action ids, -1 where a state has no legal action.
+        if epsilon is None:
+            epsilon = self.epsilon
+        if rng is None:
+            rng = np.random.default_rng()
+        if len(states) and isinstance(states[0], tuple):
+            indices = np.fromiter((state_to_index(s) for s in states), dtype=np.int64, count=len(states))
+        else:
+            indices = np.asarray(states, dtype=np.int64)
+        if legal_masks is None:
+            legal_masks = legal_mask_table()[indices]
+        legal_masks = np.asarray(legal_masks, dtype=bool)
+
+        lookup = indices
+        if self.symmetric:
+            forms = [canonical_form(index_to_state(i)) for i in indices.tolist()]
+            lookup = np.fromiter((state_to_index(form[0]) for form in forms), dtype=np.int64, count=len(forms))
+        if self.q_backend == 'dense':
+            q = self.Q.table[lookup].astype(np.float64)
+        else:
+            q = np.zeros(legal_masks.shape)
+            index = self.get_state_index()
+            for row, state_index in enumerate(lookup.tolist()):
+                state = index_to_state(state_index)
+                for action_id, value in index[state[4]].get(state, {}).items():
+                    q[row, action_id] = value
+        if self.symmetric and len(forms):
+            # column a of each row holds Q of the canonical twin of action a
+            columns = np.array([form[1] for form in forms])
+            q = np.take_along_axis(q, columns, axis=1)
+
+        q[~legal_masks] = -np.inf
+        candidates = legal_masks & (q == q.max(axis=1, keepdims=True))
+        explore = rng.random(len(indices)) < epsilon
+        candidates[explore] = legal_masks[explore]
+        # argmax of iid uniform keys is a uniform pick among the candidates
+        keys = rng.random(legal_masks.shape)
+        keys[~candidates] = -1.0
+        choices = keys.argmax(axis=1)
+        choices[~legal_masks.any(axis=1)] = -1
+        return choices
+
     def train_q_learning(self, num_episodes=20, opponent_q_path=None):
         wins = 0
         draws = 0
-        opponent_q_table = None
+        opponent = None
         if opponent_q_path and os.path.exists(opponent_q_path):
-            with open(opponent_q_path, 'rb') as f:
-                opponent_q_table = pickle.load(f)
-            print(f"Q-table loaded from {opponent_q_path} with {len(opponent_q_table)} entries.")
+            # a Q-table (pickle or shared_q.py export) compiled once, or a policy.py compiled policy file
+            # the file records whether it is symmetric, independently of this agent
+            opponent = GreedyOpponent.from_file(opponent_q_path)
+            print(f"Opponent loaded from {opponent_q_path} ({len(opponent.policy)} states).")
 
         for episode in range(num_episodes):
-            game = Game()
-            state = game.reset(evaluated_player=episode%2)
-            turn = 0
-            prev_state = None
-            prev_action_id = None
-
-            while True:
-                state = game.game_state()
-                cur_player = game.current_player
-                self.verbose_print(f"Turn {turn}: {game.game_state()}")
-                player = game.players[cur_player]
-                opponent = game.players[1 - cur_player]
-
-                # check if need to choose value first: 
-
-                valid_actions = get_valid_actions(player, opponent)
-                valid = valid_actions['actions']
-                encoded = valid_actions['encoded']
-
-                if len(encoded) == 0:
-                    break
-
-                # select action
-                if cur_player == game.evaluated_player:
-                    # if want to evaluate policy without exploration, need to set epsilon to 0
-                    action_id = self.select_action(state, encoded)
-                    action = ID_TO_ACTION[action_id]
-                # opp plays according to policy from opponent q table
-                elif opponent_q_table:
-                    # choose best Q-value
-                    q_vals = [self.Q.get((state, a), 0.0) for a in encoded]
-                    max_q = max(q_vals)
-                    best_actions = [a for a, q in zip(encoded, q_vals) if q == max_q]
-                    action_id = random.choice(best_actions)
-                    action = ID_TO_ACTION[action_id]
-                # playing against random policy opponent if no opponent q table
-                else:
-                    action_id = random.choice(encoded)
-                    action = ID_TO_ACTION[action_id]
-
-                # time t: select action A_t
-                # game.step(action)
+            won, drew = self.play_episode(episode, opponent)
+            wins += won
+            draws += drew
+            self.end_episode(episode, won, drew, wins, draws)
+
+        self.end_training()
+        return {'episodes': num_episodes, 'wins': wins, 'draws': draws}
+
+    def end_episode(self, episode, won, drew, wins, draws):
+        # Bookkeeping after each training episode, shared by the training loops: metrics,
+        # and every 100 episodes a checkpoint and a progress line. Returns True on checkpoints.
+        if self.metrics is not None:
+            self.metrics.end_episode(won, drew)
+        if (episode + 1) % 100 != 0:
+            return False
+        self.checkpoint()
+        print(f"Wins/Games: {wins}/{episode + 1} ({draws} Draws)")
+        return True
+
+    def end_training(self):
+        # after the last episode of any training loop: write out moves still buffered
+        if self.recorder is not None:
+            self.recorder.flush()
+
+    def checkpoint(self):
+        # save_q_table (timed as the 'checkpoint' phase with metrics) and flush recorded moves
+        if self.metrics is not None:
+            started = time.perf_counter()
+            self.save_q_table()
+            self.metrics.add_time('checkpoint', time.perf_counter() - started)
+        else:
+            self.save_q_table()
+        if self.recorder is not None:
+            self.recorder.flush()
+
+    def play_episode(self, episode, opponent=None):
+        # Plays and learns from one training game, returns (won, drew).
+        # opponent: object with select_action(state, action_ids), None for the uniform random opponent
+        won = False
+        drew = False
+        game = Game()
+        state = game.reset(evaluated_player=episode%2)
+        turn = 0
+        prev_state = None
+        prev_action_id = None
+        metrics = self.metrics
+        clock = time.perf_counter
+
+        while True:
+            state = game.game_state()
+            cur_player = game.current_player
+            if self.verbose: self.verbose_print(f"Turn {turn}: {game.game_state()}")
+            if metrics is not None:
+                started = clock()
+                encoded = get_valid_action_ids(state)
+                metrics.add_time('legal_moves', clock() - started)
+                started = clock()
+            else:
+                encoded = get_valid_action_ids(state)
+
+            if len(encoded) == 0:
+                break
+
+            # select action
+            if cur_player == game.evaluated_player:
+                # if want to evaluate policy without exploration, need to set epsilon to 0
+                action_id = self.select_action(state, encoded)
+                action = ID_TO_ACTION[action_id]
+            # opp plays according to its own policy (e.g. a frozen opponent q table)
+            elif opponent is not None:
+                action_id = opponent.select_action(state, encoded)
+                action = ID_TO_ACTION[action_id]
+            # playing against random policy opponent if no opponent q table
+            else:
+                action_id = random.choice(encoded)
+                action = ID_TO_ACTION[action_id]
+
+            # time t: select action A_t
+            # game.step(action)
+            if metrics is not None:
+                metrics.add_time('select_action', clock() - started)
+                started = clock()
+                game.apply_action(action)
+                metrics.add_time('apply_action', clock() - started)
+                metrics.steps += 1
+            else:
                 game.apply_action(action)
-                done = game.is_done()
-                if turn > 300:
-                    self.verbose_print('Max turns reached (300)')
-                    draws += 1
-                    done = True
-
-                # enter new state S_t+1
-                # observe reward R_t+1
-                reward = 0
-                if done:
-                    if self.verbose: game.print_players()  
+            self.total_steps += 1
+            done = game.is_done()
+            if turn > 300:
+                self.verbose_print('Max turns reached (300)')
+                drew = True
+                done = True
+            if self.recorder is not None:
+                finished = game.is_done()
+                self.recorder.record(state_to_index(state), action_id,
+                                     (1 if game.get_winner() == cur_player else -1) if finished else 0, done)
+
+            # enter new state S_t+1
+            # observe reward R_t+1
+            reward = 0
+            if done:
+                if self.verbose: game.print_players()  
+                if self.verbose:
                     won_text = 'WON' if game.get_winner() == game.evaluated_player else 'LOST'
                     self.verbose_print(f"Game {episode} Winner: {game.get_winner()} ({won_text})\n")
-                    if game.get_winner() == game.evaluated_player:
-                        reward = 1
-                        wins += 1
-                    
-                    else:
-                        reward = -1
-                    if cur_player != game.evaluated_player:
-                        q_value = self.Q.get((prev_state, prev_action_id), 0.0)
-                        self.Q[(prev_state, prev_action_id)] = (1 - self.alpha) * q_value + self.alpha * reward
-                    else:
-                        q_value = self.Q.get((state, action_id), 0.0)
-                        self.Q[(state, action_id)] = (1 - self.alpha) * q_value + self.alpha * reward
-                    break
+                if game.get_winner() == game.evaluated_player:
+                    reward = 1
+                    won = True
                 
-                # Update Q if current player
-                if cur_player == game.evaluated_player:
-                    prev_state = state
-                    prev_action_id = action_id
-                    self.update_q_table(game, cur_player, 1-cur_player, state, action_id, reward)
-                    
-                turn += 1
+                else:
+                    reward = -1
+                if cur_player != game.evaluated_player:
+                    self.terminal_update(prev_state, prev_action_id, reward)
+                else:
+                    self.terminal_update(state, action_id, reward)
+                break
+            
+            # Update Q if current player
+            if cur_player == game.evaluated_player:
+                prev_state = state
+                prev_action_id = action_id
+                self.update_q_table(game, cur_player, 1-cur_player, state, action_id, reward)
+                
+            turn += 1
 
-            if (episode + 1) % 100 == 0:
-                self.save_q_table()
-                print(f"Wins/Games: {wins}/{episode + 1} ({draws} Draws)")
+        return won, drew
 
 
     """
@@ -133,72 +293,241 @@ class Agent():
     """
     def update_q_table(self, game, cur, opp, state, action_id, reward):
         next_state = game.game_state()
+        if self.replay is not None:
+            if game.current_player != cur:
+                next_state = self.simulate_opponent(next_state, cur)
+            self.store_transition(state, action_id, reward, next_state, False)
+            return
         # game state has already been updated to state after chosen action:
         # check if current player still has to take an action -- don't have to simulate opponent choice
         valid_next_actions = []
         if game.current_player == cur:
-            valid_next_actions = get_valid_actions(
-                game.players[game.current_player],
-                game.players[game.current_player - 1]
-            )['encoded']
-            next_player_state = next_state
+            valid_next_actions = get_valid_action_ids(next_state)
+            future_qs = self.q_values(next_state, valid_next_actions)
+            max_future_q = max(future_qs) if future_qs else 0
+        elif self.update_mode == 'expected':
+            if self.metrics is not None:
+                started = time.perf_counter()
+            # expectation of max Q over every line the random opponent could play (cached per state)
+            max_future_q = 0
+            for next_player_state, valid_next_actions, probability in opponent_responses(state_to_index(next_state)):
+                future_qs = self.q_values(next_player_state, valid_next_actions)
+                if future_qs:
+                    max_future_q += probability * max(future_qs)
+            if self.metrics is not None:
+                self.metrics.add_time('opponent_simulation', time.perf_counter() - started)
         else:
-            # Simulate opponent action
-            simulated_game = Game()
-            simulated_game.set_game_state(next_state)
-            while simulated_game.current_player != cur:
-                # opponent takes a random move, next state will be the evaluated player's next state
-                valid_actions = get_valid_actions(
-                    simulated_game.players[simulated_game.current_player],
-                    simulated_game.players[simulated_game.current_player - 1]
-                )['encoded']
-                other_player_action = ID_TO_ACTION[random.choice(valid_actions)]
-                simulated_game.apply_action(other_player_action)
-
+            if self.metrics is not None:
+                started = time.perf_counter()
             # next state available for the evaluated player
-            next_player_state = simulated_game.game_state()
-            valid_next_actions = get_valid_actions(simulated_game.players[simulated_game.current_player], simulated_game.players[simulated_game.current_player - 1])['encoded']
-
-        # get best Q[next state]:
-        future_qs = []
-        for act_id in valid_next_actions:
-            future_qs.append(self.Q.get((next_player_state, act_id), 0.0))
-
-        max_future_q = max(future_qs) if future_qs else 0
-
-        q_st_at = self.Q.get((state, action_id), 0.0)
+            next_player_state = self.simulate_opponent(next_state, cur)
+            valid_next_actions = get_valid_action_ids(next_player_state)
+            if self.metrics is not None:
+                self.metrics.add_time('opponent_simulation', time.perf_counter() - started)
+
+            # get best Q[next state]:
+            future_qs = self.q_values(next_player_state, valid_next_actions)
+            max_future_q = max(future_qs) if future_qs else 0
+
+        q_st_at = self.get_q_value(state, action_id)
+
+        self.set_q_value(state, action_id, (1 - self.alpha) * q_st_at + self.alpha * (reward + self.gamma * max_future_q))
+
+    def simulate_opponent(self, next_state, cur):
+        # Simulate opponent action
+        simulated_game = Game()
+        simulated_game.set_game_state(next_state)
+        while simulated_game.current_player != cur:
+            # opponent takes a random move, next state will be the evaluated player's next state
+            valid_actions = get_valid_action_ids(simulated_game.game_state())
+            other_player_action = ID_TO_ACTION[random.choice(valid_actions)]
+            simulated_game.apply_action(other_player_action)
+        return simulated_game.game_state()
+
+    def terminal_update(self, state, action_id, reward):
+        if self.replay is not None:
+            self.store_transition(state, action_id, reward, None, True)
+            return
+        q_value = self.get_q_value(state, action_id)
+        self.set_q_value(state, action_id, (1 - self.alpha) * q_value + self.alpha * reward)
+
+    def store_transition(self, state, action_id, reward, next_state, done):
+        # replay mode: buffer the transition (canonical when symmetric), then pay off any minibatches due
+        if self.symmetric:
+            state, action_id = canonicalize(state, action_id)
+        next_index = 0
+        next_action_ids = []
+        if not done:
+            next_action_ids = get_valid_action_ids(next_state)
+            if self.symmetric:
+                next_state, to_canonical, _ = canonical_form(next_state)
+                next_action_ids = [to_canonical[a] for a in next_action_ids]
+            next_index = state_to_index(next_state)
+        self.replay.add(state_to_index(state), action_id, reward, next_index, next_action_ids, done)
+        for _ in range(self.replay.batches_due()):
+            self.replay_update()
+
+    def replay_update(self, batch_size=None):
+        states, actions, rewards, next_states, next_masks, dones = self.replay.sample(batch_size)
+        Q = self.Q
+        targets = replay_targets(Q.table, rewards, next_states, next_masks, dones, self.gamma)
+        self.compiled_policy = None
+        new_entries = Q.set_many(states, actions, (1 - self.alpha) * Q.table[states, actions] + self.alpha * targets)
+        if self.metrics is not None:
+            self.metrics.new_q_entries += new_entries
+        if self.dirty_keys is not None:
+            self.dirty_keys.update(zip(map(index_to_state, states.tolist()), actions.tolist()))
+
+    @property
+    def Q(self):
+        if self._Q is None:
+            self.Q = make_q_table(self.q_backend)
+            self.load_q_table()
+        return self._Q
+
+    @Q.setter
+    def Q(self, table):
+        self._Q = table
+        self.compiled_policy = None
+        # the index describes the old table, rebuild it on the next query
+        self.state_index = None
+
+    def get_state_index(self):
+        if self.state_index is None:
+            index = ({}, {})
+            for (state, action_id), value in self.Q.items():
+                index[state[4]].setdefault(state, {})[action_id] = value
+            self.state_index = index
+        return self.state_index
+
+    def get_q_value(self, state, action_id):
+        if self.symmetric:
+            state, action_id = canonicalize(state, action_id)
+        Q = self.Q
+        if self.q_backend == 'dense':
+            # unvisited entries hold 0.0, the default
+            return Q.flat_values[state_to_index(state) * Q.n_actions + action_id]
+        return Q.get((state, action_id), 0.0)
+
+    def set_q_value(self, state, action_id, value):
+        if self.symmetric:
+            state, action_id = canonicalize(state, action_id)
+        Q = self.Q
+        if self.metrics is not None and (state, action_id) not in Q:
+            self.metrics.new_q_entries += 1
+        if self.q_backend == 'dense':
+            Q.set_at(state_to_index(state), action_id, value)
+        else:
+            Q[(state, action_id)] = value
+        self.compiled_policy = None
+        if self.state_index is not None:
+            self.state_index[state[4]].setdefault(state, {})[action_id] = value
+        if self.dirty_keys is not None:
+            self.dirty_keys.add((state, action_id))
+        if self.visit_counts is not None:
+            key = (state, action_id)
+            self.visit_counts[key] = self.visit_counts.get(key, 0) + 1
+
+    def q_values(self, state, action_ids):
+        if self.symmetric:
+            state, to_canonical, _ = canonical_form(state)
+            action_ids = [to_canonical[a] for a in action_ids]
+        Q = self.Q
+        if self.q_backend == 'dense':
+            # straight off the flat view, one state_to_index per call
+            values = Q.flat_values
+            base = state_to_index(state) * Q.n_actions
+            return [values[base + a] for a in action_ids]
+        return [Q.get((state, a), 0.0) for a in action_ids]
+
+    def state_action_values(self, state):
+        # (action_id, value) pairs stored for one state
+        if self.symmetric:
+            state, _, from_canonical = canonical_form(state)
+            return [(from_canonical[a], value) for a, value in self._stored_action_values(state)]
+        return self._stored_action_values(state)
+
+    def _stored_action_values(self, state):
+        if self.q_backend == 'dense':
+            return self.Q.state_action_values(state)
+        return list(self.get_state_index()[state[4]].get(state, {}).items())
+
+    def snapshot_policy(self, name='snapshot'):
+        # frozen greedy copy of the current table, for opponent pools
+        return GreedyOpponent.from_q_table(self.Q, name, self.symmetric)
+
+    def compile_policy(self, filename=None):
+        # greedy moves become one array lookup until the next Q write; filename also saves the artifact
+        self.compiled_policy = CompiledPolicy.from_q_table(self.Q, self.symmetric)
+        if filename:
+            self.compiled_policy.save(filename)
+        return self.compiled_policy
+
+    def load_policy(self, filename):
+        self.compiled_policy = CompiledPolicy.open(filename)
+        return self.compiled_policy
 
-        self.Q[(state, action_id)] =  (1 - self.alpha) * q_st_at + self.alpha * (reward + self.gamma * max_future_q)
-    
     def save_q_table(self):
-        with open(self.q_table_src, 'wb') as f:
-            pickle.dump(self.Q, f)
+        if self.q_table_src is None:
+            return
+        if self.checkpoint_log is not None:
+            # cost scales with the entries written since the last save
+            self.checkpoint_log.append({key: self.Q[key] for key in self.dirty_keys})
+            self.dirty_keys.clear()
+            if self.checkpoint_log.records_since_compaction >= self.compact_every:
+                self.checkpoint_log.compact(self.Q)
+            return
+        # the file is always the plain dict pickle, whatever the backend
+        save_q_dict(self.q_table_src, self.Q, self.symmetric)
 
     def load_q_table(self):
         filename = self.q_table_src
-        if os.path.exists(filename):
-            with open(filename, 'rb') as f:
-                self.Q = pickle.load(f)
+        # q_table_src=None gives an in-memory agent with no backing file
+        if filename is None:
+            return
+        started = time.perf_counter()
+        if self.checkpoint_log is not None:
+            # snapshot plus every record appended since it was written
+            self.Q = make_q_table(self.q_backend, self.checkpoint_log.load())
             print(f"Q-table loaded from {filename} with {len(self.Q)} entries.")
-        self.show_top_n_moves(3)
-        self.show_bottom_n_moves(3)
+        elif os.path.exists(filename):
+            # a table saved with the other symmetric setting is refused, not misread
+            self.Q = make_q_table(self.q_backend, load_q_dict(filename, self.symmetric))
+            print(f"Q-table loaded from {filename} with {len(self.Q)} entries.")
+        self.load_seconds = time.perf_counter() - started
+        if not self.lazy_load:
+            self.show_summary(3)
+
+    def show_summary(self, n=3):
+        self.show_top_n_moves(n)
+        self.show_bottom_n_moves(n)
+
+    def best_n_entries(self, n, largest=True):
+        # n largest/smallest entries without sorting the whole table
+        if self.q_backend == 'dense':
+            return self.Q.top_n(n, largest=largest)
+        if largest:
+            return heapq.nlargest(n, self.Q.items(), key=lambda x: x[1])
+        return heapq.nsmallest(n, self.Q.items(), key=lambda x: x[1])
 
 
     def show_top_n_moves(self, n=10):
-        top_q = sorted(self.Q.items(), key=lambda x: -x[1])[:n]
+        top_q = self.best_n_entries(n)
         print(f"Top {n} moves")
         for (state, action_id), value in top_q:
             print(f"Q[{state}, {action_id}] = {value:.2f}")
 
     def show_top_n_moves_based_on_player(self, n=10, player=1):
-        # Filter Q-table to only include entries where state[4] is 0 or 1
-        filtered_q = {
-            k: v for k, v in self.Q.items()
-            if k[0][4] == player
-        }
-
-        # Sort the filtered Q-table by value descending
-        top_q = sorted(filtered_q.items(), key=lambda x: -x[1])[:n]
+        # Only entries where state[4] is the given player, n largest kept in a heap
+        if self.q_backend == 'dense':
+            top_q = self.Q.top_n(n, player=player)
+        else:
+            entries = (
+                ((state, action_id), value)
+                for state, actions in self.get_state_index()[player].items()
+                for action_id, value in actions.items()
+            )
+            top_q = heapq.nlargest(n, entries, key=lambda x: x[1])
 
         print(f"Top {n} moves where state[4] is {player}:")
         for (state, action_id), value in top_q:
@@ -206,7 +535,7 @@ class Agent():
 
     def show_state_value(self, state=(1,1,1,1,0)):
         # Find all (action, Q-value) pairs for the given state
-        actions = [(action_id, value) for (s, action_id), value in self.Q.items() if s == state]
+        actions = self.state_action_values(state)
 
         if not actions:
             print(f"No Q-values found for state {state}.")
@@ -222,7 +551,7 @@ class Agent():
     
     def action_values_in_state(self, state=(1,1,1,1,0)):
         # Find all (action, Q-value) pairs for the given state
-        actions = [(action_id, value) for (s, action_id), value in self.Q.items() if s == state]
+        actions = self.state_action_values(state)
 
         if not actions:
             print(f"No Q-values found for state {state}.")
@@ -234,7 +563,7 @@ class Agent():
             print(f"  {ID_TO_ACTION[action_id]}: ({value:.4f})")
 
     def show_bottom_n_moves(self, n=10):
-        bot_q = sorted(self.Q.items(), key=lambda x: x[1])[:n]
+        bot_q = self.best_n_entries(n, largest=False)
         print(f"Bottom {n} moves")
         for (state, action_id), value in bot_q:
             print(f"Q[{state}, {action_id}] = {value:.2f}")
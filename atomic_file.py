@@ -0,0 +1,29 @@
+import os
+import threading
+from contextlib import contextmanager
+
+# Files that are rewritten whole (Q-tables, exports, compiled policies, caches) are
+# written to a temp file next to the target and renamed over it, so readers see the
+# old file or the new one, never a torn one. The temp name carries the process and
+# thread id, so writers saving the same target at once cannot mix their bytes.
+#
+#   with atomic_write('q_table.pkl') as f:
+#       pickle.dump(Q, f)
+
+
+@contextmanager
+def atomic_write(filename):
+    tmp_filename = f"{filename}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        # w+b, so the temp file can also be memory-mapped while it is filled
+        with open(tmp_filename, 'w+b') as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_filename, filename)
+    except BaseException:
+        try:
+            os.remove(tmp_filename)
+        except OSError:
+            pass
+        raise
@@ -0,0 +1,82 @@
+import numpy as np
+
+from engine import *
+
+
+def sample_random_actions(legal_mask, rng):
+    # one uniformly random legal action per row of a (num_games, num_actions) mask
+    keys = rng.random(legal_mask.shape)
+    keys[~legal_mask] = -1.0
+    return keys.argmax(axis=1)
+
+
+class BatchGame:
+    # N independent games stepped in lockstep, stored as engine state indices.
+    # Finished games are reset to the opening position automatically.
+    def __init__(self, num_games, max_turns=300):
+        self.num_games = num_games
+        # same cap as train_q_learning; None plays every game to a result
+        self.max_turns = max_turns
+        self.transitions = transition_table()
+        self.legal_masks = legal_mask_table()
+        self.states = np.full(num_games, INITIAL_STATE, dtype=np.int32)
+        self.turns = np.zeros(num_games, dtype=np.int32)
+        # alternates per game slot like episode % 2 in train_q_learning
+        self.evaluated_player = (np.arange(num_games) % 2).astype(np.int8)
+
+    def reset(self):
+        self.states[:] = INITIAL_STATE
+        self.turns[:] = 0
+        self.evaluated_player = (np.arange(self.num_games) % 2).astype(np.int8)
+        return self.states.copy()
+
+    @property
+    def hands(self):
+        # (num_games, 4) hand codes, the first four entries of Game.game_state()
+        return STATE_HANDS[self.states]
+
+    @property
+    def current_player(self):
+        return STATE_PLAYER[self.states]
+
+    def game_states(self):
+        return [index_to_state(int(index)) for index in self.states]
+
+    def legal_mask(self):
+        return self.legal_masks[self.states]
+
+    def step(self, action_ids):
+        action_ids = np.asarray(action_ids)
+        next_states = self.transitions[self.states, action_ids]
+        illegal = next_states < 0
+        if illegal.any():
+            game = int(np.flatnonzero(illegal)[0])
+            raise ValueError(
+                f"Action {int(action_ids[game])} is not legal in game {game} "
+                f"(state {index_to_state(int(self.states[game]))})"
+            )
+
+        done = STATE_DONE[next_states]
+        winner = STATE_WINNER[next_states]
+        truncated = np.zeros(self.num_games, dtype=bool)
+        if self.max_turns is not None:
+            # train_q_learning counts a draw once the turn counter passes the cap
+            truncated = ~done & (self.turns > self.max_turns)
+            done = done | truncated
+        evaluated_player = self.evaluated_player.copy()
+
+        self.states = np.where(done, INITIAL_STATE, next_states).astype(np.int32)
+        self.turns += 1
+
+        if done.any():
+            self.turns[done] = 0
+            self.evaluated_player[done] = 1 - self.evaluated_player[done]
+
+        return {
+            'states': next_states,
+            'done': done,
+            'truncated': truncated,
+            'winner': winner,
+            'evaluated_player': evaluated_player,
+            'legal_mask': self.legal_mask(),
+        }
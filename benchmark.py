@@ -0,0 +1,229 @@
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+from agent import *
+
+# Benchmarks for the game engine and training loop.
+#   python benchmark.py                       writes benchmark_results.json
+#   python benchmark.py --compare old.json    also flags regressions against an earlier run
+
+DEFAULT_OUTPUT = 'benchmark_results.json'
+
+
+def sample_states(count, seed=0):
+    # states seen in random self-play, not uniformly drawn codes
+    rng = random.Random(seed)
+    states = []
+    game = Game()
+    game.reset()
+    while len(states) < count:
+        state = game.game_state()
+        action_ids = get_valid_action_ids(state)
+        if game.is_done() or not action_ids:
+            game.reset()
+            continue
+        states.append(state)
+        game.apply_action(ID_TO_ACTION[rng.choice(action_ids)])
+    return states
+
+
+def time_per_call(fn, args_list, min_seconds=0.2):
+    # runs fn over args_list until min_seconds has passed, returns microseconds per call
+    calls = 0
+    started = time.perf_counter()
+    elapsed = 0.0
+    while elapsed < min_seconds:
+        for args in args_list:
+            fn(*args)
+        calls += len(args_list)
+        elapsed = time.perf_counter() - started
+    return elapsed / calls * 1e6
+
+
+def time_difference(fn, baseline, args_list, min_seconds=0.2):
+    # microseconds per call of fn minus baseline (setup that fn repeats on every call).
+    # Passes over args_list alternate between the two so machine noise hits both alike,
+    # and the difference is clamped at 0.
+    fn_seconds = 0.0
+    baseline_seconds = 0.0
+    passes = 0
+    clock = time.perf_counter
+    while fn_seconds + baseline_seconds < min_seconds:
+        started = clock()
+        for args in args_list:
+            fn(*args)
+        fn_seconds += clock() - started
+        started = clock()
+        for args in args_list:
+            baseline(*args)
+        baseline_seconds += clock() - started
+        passes += 1
+    return max(0.0, (fn_seconds - baseline_seconds) / (passes * len(args_list)) * 1e6)
+
+
+def bench_calls(states, min_seconds):
+    results = {}
+    game = Game()
+
+    # the reference generator works on a Game, so setting the state is timed and subtracted
+    def valid_actions_reference(state):
+        game.set_game_state(state)
+        get_valid_actions(game.players[game.current_player], game.players[1 - game.current_player])
+    results['get_valid_actions_us'] = time_difference(valid_actions_reference, game.set_game_state,
+                                                      [(s,) for s in states], min_seconds)
+    results['get_valid_action_ids_us'] = time_per_call(get_valid_action_ids, [(s,) for s in states], min_seconds)
+
+    moves = [(state, ID_TO_ACTION[get_valid_action_ids(state)[0]]) for state in states]
+
+    def set_and_apply(state, action):
+        game.set_game_state(state)
+        game.apply_action(action)
+    results['Game.apply_action_us'] = time_difference(set_and_apply, lambda state, action: game.set_game_state(state),
+                                                      moves, min_seconds)
+    results['Game.set_game_state_us'] = time_per_call(game.set_game_state, [(s,) for s in states], min_seconds)
+    results['Game.game_state_us'] = time_per_call(game.game_state, [()] * len(states), min_seconds)
+
+    random.seed(0)
+    trained = Agent(q_table_src=None)
+    trained.train_q_learning(num_episodes=200)
+    for backend in Q_BACKENDS:
+        agent = Agent(q_table_src=None, q_backend=backend)
+        agent.Q = make_q_table(backend, dict(to_q_dict(trained.Q)))
+        selections = [(state, get_valid_action_ids(state)) for state in states]
+        results[f'Agent.select_action_{backend}_us'] = time_per_call(agent.select_action, selections, min_seconds)
+        # the per-step table reads the training loop makes
+        results[f'Agent.q_values_{backend}_us'] = time_per_call(agent.q_values, selections, min_seconds)
+        lookups = [(state, action_ids[0]) for state, action_ids in selections]
+        results[f'Agent.get_q_value_{backend}_us'] = time_per_call(agent.get_q_value, lookups, min_seconds)
+
+        updates = []
+        for state, action in moves:
+            update_game = Game()
+            update_game.set_game_state(state)
+            cur = update_game.current_player
+            update_game.apply_action(action)
+            if not update_game.is_done():
+                updates.append((update_game, cur, state, ACTION_TO_ID[action]))
+
+        def update(update_game, cur, state, action_id):
+            agent.update_q_table(update_game, cur, 1 - cur, state, action_id, 0)
+        results[f'Agent.update_q_table_{backend}_us'] = time_per_call(update, updates, min_seconds)
+        writes = [(state, action_id, 0.5) for state, action_id in lookups]
+        results[f'Agent.set_q_value_{backend}_us'] = time_per_call(agent.set_q_value, writes, min_seconds)
+    return results
+
+
+def bench_training(num_episodes, q_backend='dict'):
+    random.seed(0)
+    agent = Agent(q_table_src=None, q_backend=q_backend)
+    started = time.perf_counter()
+    stats = agent.train_q_learning(num_episodes=num_episodes)
+    elapsed = time.perf_counter() - started
+    return {
+        'episodes': num_episodes,
+        'steps': agent.total_steps,
+        'seconds': elapsed,
+        'episodes_per_sec': num_episodes / elapsed,
+        'steps_per_sec': agent.total_steps / elapsed,
+        'win_rate': stats['wins'] / num_episodes,
+        'q_entries': len(agent.Q),
+    }
+
+
+def bench_memory(num_entries=200000):
+    # bytes per million entries for a dict table of realistic keys, and for the dense table
+    states = [index_to_state(index) for index in range(NUM_STATES)]
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    Q = {}
+    n_actions = num_actions()
+    for i in range(num_entries):
+        Q[(states[i // n_actions % NUM_STATES], i % n_actions)] = float(i)
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del Q
+
+    dense = DenseQTable()
+    capacity = NUM_STATES * n_actions
+    return {
+        'dict_bytes_per_million_entries': used / num_entries * 1e6,
+        'dense_bytes_total': dense.nbytes(),
+        'dense_bytes_per_million_entries_at_capacity': dense.nbytes() / capacity * 1e6,
+        'dense_capacity_entries': capacity,
+    }
+
+
+def bench_startup(repeats=5):
+    started = time.perf_counter()
+    for _ in range(repeats):
+        Agent(q_table_src=None, lazy_load=True)
+    return {'lazy_agent_construct_us': (time.perf_counter() - started) / repeats * 1e6}
+
+
+def run_benchmarks(num_episodes=500, num_states=500, min_seconds=0.2):
+    started = time.perf_counter()
+    # table build/load is a one-off cost, keep it out of the per-call numbers
+    load_legal_move_table()
+    return {
+        'meta': {
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'num_episodes': num_episodes,
+            'num_states': num_states,
+        },
+        'calls': bench_calls(sample_states(num_states), min_seconds),
+        'training': {backend: bench_training(num_episodes, backend) for backend in Q_BACKENDS},
+        'memory': bench_memory(),
+        'startup': bench_startup(),
+        'total_seconds': time.perf_counter() - started,
+    }
+
+
+def compare_results(old, new, tolerance=0.1):
+    # returns (metric, old, new) for timings that got slower / rates that dropped by more than tolerance
+    regressions = []
+    for section in ('calls', 'startup'):
+        for metric, new_value in new.get(section, {}).items():
+            old_value = old.get(section, {}).get(metric)
+            if old_value and new_value > old_value * (1 + tolerance):
+                regressions.append((f'{section}.{metric}', old_value, new_value))
+    for backend, run in new.get('training', {}).items():
+        for metric in ('episodes_per_sec', 'steps_per_sec'):
+            old_value = old.get('training', {}).get(backend, {}).get(metric)
+            if old_value and run[metric] < old_value * (1 - tolerance):
+                regressions.append((f'training.{backend}.{metric}', old_value, run[metric]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the game engine and training loop.')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT)
+    parser.add_argument('--episodes', type=int, default=500)
+    parser.add_argument('--states', type=int, default=500)
+    parser.add_argument('--min-seconds', type=float, default=0.2)
+    parser.add_argument('--compare', help='earlier results file to check for regressions')
+    parser.add_argument('--tolerance', type=float, default=0.1)
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.episodes, args.states, args.min_seconds)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(json.dumps(results, indent=2))
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare_results(json.load(f), results, args.tolerance)
+        for metric, old_value, new_value in regressions:
+            print(f"REGRESSION {metric}: {old_value:.2f} -> {new_value:.2f}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
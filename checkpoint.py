@@ -0,0 +1,60 @@
+import os
+import pickle
+
+from q_tables import *
+
+# Incremental Q-table checkpoints: a snapshot in the usual pickle format plus
+# an append-only log of {(state, action_id): value} records written since.
+# Records hold absolute values, so replaying one twice is harmless and a crash
+# between the snapshot rename and the log truncation loses nothing.
+
+
+class QCheckpointLog:
+    def __init__(self, snapshot_path, log_path=None, symmetric=False):
+        self.snapshot_path = snapshot_path
+        self.log_path = log_path or snapshot_path + '.log'
+        # recorded in the snapshot, see save_q_dict
+        self.symmetric = symmetric
+        self.records_since_compaction = 0
+
+    def load(self):
+        Q = load_q_dict(self.snapshot_path, self.symmetric) if os.path.exists(self.snapshot_path) else {}
+        if not os.path.exists(self.log_path):
+            return Q
+
+        records = 0
+        good_offset = 0
+        with open(self.log_path, 'rb') as f:
+            while True:
+                try:
+                    entries = pickle.load(f)
+                except EOFError:
+                    break
+                except (pickle.UnpicklingError, ValueError, IndexError):
+                    # a record cut short by a crash, everything before it is intact
+                    break
+                Q.update(entries)
+                records += 1
+                good_offset = f.tell()
+        if good_offset < os.path.getsize(self.log_path):
+            # drop the torn tail so later appends stay readable
+            with open(self.log_path, 'r+b') as f:
+                f.truncate(good_offset)
+        self.records_since_compaction = records
+        return Q
+
+    def append(self, entries):
+        if not entries:
+            return
+        with open(self.log_path, 'ab') as f:
+            pickle.dump(entries, f)
+            f.flush()
+            os.fsync(f.fileno())
+        self.records_since_compaction += 1
+
+    def compact(self, Q):
+        # save_q_dict renames a finished temp file over the snapshot
+        save_q_dict(self.snapshot_path, Q, self.symmetric)
+        with open(self.log_path, 'wb') as f:
+            os.fsync(f.fileno())
+        self.records_since_compaction = 0
@@ -0,0 +1,104 @@
+import numpy as np
+
+from legal_moves import *
+
+# The game as a pure function of the state index:
+#   next_state = TRANSITIONS[state_to_index(state), action_id]
+# built by running Game.apply_action from every state reachable from Game.reset().
+# Entries are -1 for illegal actions, terminal states and unreachable states.
+
+INITIAL_STATE = state_to_index(Game().reset())
+
+
+def _hand_codes():
+    indices = np.arange(NUM_STATES)
+    current_player = indices % 2
+    codes = np.empty((NUM_STATES, 4), dtype=np.int64)
+    rest = indices // 2
+    for i in range(3, -1, -1):
+        codes[:, i] = rest % NUM_HAND_CODES
+        rest //= NUM_HAND_CODES
+    return codes, current_player
+
+
+_codes, _current = _hand_codes()
+# per-state lookups matching Game.is_done / Game.get_winner / Game.current_player
+STATE_HANDS = _codes.astype(np.int8)
+STATE_PLAYER = _current.astype(np.int8)
+_alive0 = (_codes[:, 0] > 0) | (_codes[:, 1] > 0)
+_alive1 = (_codes[:, 2] > 0) | (_codes[:, 3] > 0)
+STATE_DONE = ~_alive0 | ~_alive1
+STATE_WINNER = np.full(NUM_STATES, -1, dtype=np.int8)
+STATE_WINNER[_alive0 & ~_alive1] = 0
+STATE_WINNER[_alive1 & ~_alive0] = 1
+del _codes, _current, _alive0, _alive1
+
+_TABLES = {}
+
+
+def build_transition_table():
+    if not ID_TO_ACTION:
+        load_actions_from_file()
+    transitions = np.full((NUM_STATES, len(ID_TO_ACTION)), -1, dtype=np.int32)
+    game = Game()
+    seen = {INITIAL_STATE}
+    reachable = [INITIAL_STATE]
+    frontier = [INITIAL_STATE]
+    while frontier:
+        index = frontier.pop()
+        if STATE_DONE[index]:
+            continue
+        state = index_to_state(index)
+        for action_id in get_valid_action_ids_by_index(index):
+            game.set_game_state(state)
+            game.apply_action(ID_TO_ACTION[action_id])
+            next_index = state_to_index(game.game_state())
+            transitions[index, action_id] = next_index
+            if next_index not in seen:
+                seen.add(next_index)
+                reachable.append(next_index)
+                frontier.append(next_index)
+    reachable.sort()
+    return transitions, np.array(reachable, dtype=np.int32)
+
+
+def transition_table():
+    if 'transitions' not in _TABLES:
+        _TABLES['transitions'], _TABLES['reachable'] = build_transition_table()
+    return _TABLES['transitions']
+
+
+def reachable_states():
+    transition_table()
+    return _TABLES['reachable']
+
+
+def legal_mask_table():
+    # LEGAL_MASK[state_index, action_id] is True when get_valid_actions allows it
+    if 'legal_mask' not in _TABLES:
+        if not LEGAL_MOVES:
+            load_legal_move_table()
+        mask = np.zeros((NUM_STATES, len(ID_TO_ACTION)), dtype=bool)
+        for index, action_ids in enumerate(LEGAL_MOVES):
+            mask[index, list(action_ids)] = True
+        _TABLES['legal_mask'] = mask
+    return _TABLES['legal_mask']
+
+
+def step(state_index, action_id):
+    next_index = int(transition_table()[state_index, action_id])
+    if next_index < 0:
+        raise ValueError(f"Action {action_id} is not legal in state {index_to_state(state_index)}")
+    return next_index
+
+
+def is_done(state_index):
+    return bool(STATE_DONE[state_index])
+
+
+def get_winner(state_index):
+    return int(STATE_WINNER[state_index])
+
+
+def current_player(state_index):
+    return state_index % 2
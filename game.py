@@ -6,6 +6,24 @@ from actions import *
 
 EXTRA_VERBOSE = False
 
+# game_state() is four hand codes (0-11) plus the current player
+NUM_HAND_CODES = 12
+NUM_STATES = NUM_HAND_CODES ** 4 * 2
+
+def state_to_index(state):
+    # (((h0 * 12 + h1) * 12 + h2) * 12 + h3) * 2 + player, with the strides folded into constants
+    return state[0] * (12 ** 3 * 2) + state[1] * (12 ** 2 * 2) + state[2] * (12 * 2) + state[3] * 2 + state[4]
+
+def index_to_state(index):
+    current_player = index % 2
+    index //= 2
+    codes = []
+    for _ in range(4):
+        codes.append(index % NUM_HAND_CODES)
+        index //= NUM_HAND_CODES
+    codes.reverse()
+    return tuple(codes) + (current_player,)
+
 class Game:
     def __init__(self):
         self.reset()
@@ -22,11 +40,34 @@ class Game:
         self.current_player = new_state[4]
 
     def game_state(self):
-        player1 = self.players[0].encode_state()
-        player2 = self.players[1].encode_state()
-        observation = player1 + player2
-        observation.append(self.current_player)
-        return tuple(observation)
+        hands1 = self.players[0].hands
+        hands2 = self.players[1].hands
+        return (hands1[0].encode_state(), hands1[1].encode_state(),
+                hands2[0].encode_state(), hands2[1].encode_state(), self.current_player)
+
+    # The whole game packed into one int: state_to_index(game_state()) * 2 + evaluated_player.
+    # restore() writes it back into the existing Player/Hand objects.
+    def snapshot(self):
+        return state_to_index(self.game_state()) * 2 + self.evaluated_player
+
+    def restore(self, snapshot):
+        self.evaluated_player = snapshot % 2
+        index = snapshot // 2
+        self.current_player = index % 2
+        index //= 2
+        hands1 = self.players[0].hands
+        hands2 = self.players[1].hands
+        hands2[1].set_as_encoded_state(index % NUM_HAND_CODES)
+        index //= NUM_HAND_CODES
+        hands2[0].set_as_encoded_state(index % NUM_HAND_CODES)
+        index //= NUM_HAND_CODES
+        hands1[1].set_as_encoded_state(index % NUM_HAND_CODES)
+        hands1[0].set_as_encoded_state(index // NUM_HAND_CODES)
+
+    def clone(self):
+        other = Game()
+        other.restore(self.snapshot())
+        return other
 
     def is_done(self):
         return not self.players[0].is_alive() or not self.players[1].is_alive()
@@ -56,97 +97,115 @@ class Game:
         if EXTRA_VERBOSE:
             print('chosen action: ', action)
 
-        player = self.players[self.current_player]
+        effect = action.effect
+        if effect is None:
+            effect = bind_effect(action)
+        # Step game state to next player
         player_index = self.current_player
-        opponent = self.players[1 - self.current_player]
-        opponent_index = 1-player_index
-        next_player = opponent_index
-        
-
-        if action.action_type == 'add':
-            src_hand = player.get_hands()[action.source]
-            target = opponent.get_hands()[action.targets[0] - 2]
-            # shift the range from 1–5 0–4 before the modulo, then add 1 after
-            target.value = (target.value + src_hand.value - 1) % 5 + 1
-            # Opponent must immediately choose its state if 4 or 5
-            if target.value > 3:
-                target.state = 2
-
-
-        elif action.action_type == 'redistribute':
-            values = action.params['values']
-            player.get_hands()[0].value = values[0]
-            player.get_hands()[1].value = values[1]
-            # Cur player must immediately choose its state if either hand is 4 or 5
-            if player.get_hands()[0].value > 3:
-                player.get_hands()[0].state = 2
-                next_player = player_index
-            if player.get_hands()[1].value > 3:
-                player.get_hands()[1].state = 2
-                next_player = player_index
-
-        elif action.action_type == 'special':
-            index = action.targets[0]
-            if action.params['ability'] == 'plumb':
-                if index > 1:
-                    target = opponent.get_hands()[index - 2]
-                else:
-                    target = player.get_hands()[index]
-                target.alive = 0
-            elif action.params['ability'] == 'scissors':
-                if index > 1:
-                    target = opponent.get_hands()[index - 2]
-                else:
-                    target = player.get_hands()[index]
-                if target.value == 1:
-                    target.value = 5
-                    target.state = 0
-                else:
-                    target.alive = 0
-            elif action.params['ability'] == 'paper':
-                if index > 1:
-                    target = opponent.get_hands()[index - 2]
-                else:
-                    target = player.get_hands()[index]
-                target.alive = 0
-            elif action.params['ability'] == 'rock':
-                if index > 1:
-                    target = opponent.get_hands()[index - 2]
-                else:
-                    target = player.get_hands()[index]
+        self.current_player = effect(self.players[player_index], self.players[1 - player_index], player_index)
+
+
+# Effect handlers: each catalog action is compiled once into a function
+# effect(player, opponent, player_index) that applies it and returns the next player.
+
+def _target_hand(player, opponent, index):
+    # 0/1 are the mover's own hands, 2/3 the opponent's
+    return opponent.hands[index - 2] if index > 1 else player.hands[index]
+
+def _add_effect(source, target_index):
+    def effect(player, opponent, player_index):
+        src_hand = player.hands[source]
+        target = opponent.hands[target_index - 2]
+        # shift the range from 1–5 0–4 before the modulo, then add 1 after
+        target.value = (target.value + src_hand.value - 1) % 5 + 1
+        # Opponent must immediately choose its state if 4 or 5
+        if target.value > 3:
+            target.state = 2
+        return 1 - player_index
+    return effect
+
+def _redistribute_effect(values):
+    def effect(player, opponent, player_index):
+        left, right = player.hands
+        left.value = values[0]
+        right.value = values[1]
+        next_player = 1 - player_index
+        # Cur player must immediately choose its state if either hand is 4 or 5
+        if left.value > 3:
+            left.state = 2
+            next_player = player_index
+        if right.value > 3:
+            right.state = 2
+            next_player = player_index
+        return next_player
+    return effect
+
+def _kill_effect(targets):
+    # plumb, paper, rock and scissors_plumb
+    def effect(player, opponent, player_index):
+        for index in targets:
+            _target_hand(player, opponent, index).alive = 0
+        return 1 - player_index
+    return effect
+
+def _cut_effect(targets):
+    # scissors and 3_scissors: a 1 becomes a rock 5, anything else dies
+    def effect(player, opponent, player_index):
+        for index in targets:
+            target = _target_hand(player, opponent, index)
+            if target.value == 1:
+                target.value = 5
+                target.state = 0
+            else:
                 target.alive = 0
-            elif action.params['ability'] == 'scissors_plumb':
-                for index in action.targets:
-                    if index > 1:
-                        target = opponent.get_hands()[index - 2]
-                    else:
-                        target = player.get_hands()[index]
-                    target.alive = 0
-            elif action.params['ability'] == '3_scissors':
-                for index in action.targets:
-                    if index > 1:
-                        target = opponent.get_hands()[index - 2]
-                    else:
-                        target = player.get_hands()[index]
-                    if target.value == 1:
-                        target.value = 5
-                        target.state = 0
-                    else:
-                        target.alive = 0
-                
-        elif action.action_type == 'switch':
-            player.get_hands()[action.source].state = 1 - player.get_hands()[action.source].state
-
-        elif action.action_type == 'form':
-            # prev hand state MUST have been either 2 or 3 (pending)
-            prev_hand_state = player.get_hands()[action.source].state
-            if prev_hand_state not in [2,3]:
-                print('PREV HAND STATE ISSUE -- FORM CHANGE WAS NOT FROM 2 OR 3')
-            player.get_hands()[action.source].state = action.params['form']
-            if prev_hand_state == 2:
-                next_player = player_index
-
-
-        # Step game state to next player
-        self.current_player = next_player
-
+        return 1 - player_index
+    return effect
+
+def _switch_effect(source):
+    def effect(player, opponent, player_index):
+        hand = player.hands[source]
+        hand.state = 1 - hand.state
+        return 1 - player_index
+    return effect
+
+def _form_effect(source, form):
+    def effect(player, opponent, player_index):
+        hand = player.hands[source]
+        # prev hand state MUST have been either 2 or 3 (pending)
+        prev_hand_state = hand.state
+        if prev_hand_state not in [2,3]:
+            print('PREV HAND STATE ISSUE -- FORM CHANGE WAS NOT FROM 2 OR 3')
+        hand.state = form
+        if prev_hand_state == 2:
+            return player_index
+        return 1 - player_index
+    return effect
+
+def _no_effect(player, opponent, player_index):
+    return 1 - player_index
+
+def compile_effect(action):
+    if action.action_type == 'add':
+        return _add_effect(action.source, action.targets[0])
+    if action.action_type == 'redistribute':
+        return _redistribute_effect(tuple(action.params['values']))
+    if action.action_type == 'special':
+        ability = action.params['ability']
+        if ability in ('plumb', 'paper', 'rock'):
+            return _kill_effect(action.targets[:1])
+        if ability == 'scissors':
+            return _cut_effect(action.targets[:1])
+        if ability == 'scissors_plumb':
+            return _kill_effect(action.targets)
+        if ability == '3_scissors':
+            return _cut_effect(action.targets)
+    elif action.action_type == 'switch':
+        return _switch_effect(action.source)
+    elif action.action_type == 'form':
+        return _form_effect(action.source, action.params['form'])
+    return _no_effect
+
+def bind_effect(action):
+    effect = compile_effect(action)
+    object.__setattr__(action, 'effect', effect)
+    return effect
@@ -1,8 +1,13 @@
 
+# (value, state) for each live hand code 1-11, see Hand.encode_state
+DECODED_HANDS = [None, (1, 0), (2, 0), (3, 0)] + [(4, state) for state in range(4)] + [(5, state) for state in range(4)]
+
 class Hand: 
     # value: range from 1-5
     # state: range from 0-3 (0/1 are scissors/paper or rock/paper; 2 is pending -> same player's turn, 3 is pending -> change players)
     # alive: boolean 0 or 1
+    __slots__ = ('value', 'state', 'alive')
+
     def __init__(self):
         self.value = 1
         self.state = 0
@@ -21,18 +26,9 @@ class Hand:
     def set_as_encoded_state(self, encoded_state):
         if encoded_state == 0:
             self.alive = 0
-        elif encoded_state < 4:
-            self.value = encoded_state
-            self.alive = 1
-            self.state = 0
-        elif encoded_state < 7:
-            self.value = 4
-            self.alive = 1
-            self.state = encoded_state - 5
         else:
-            self.value = 5
+            self.value, self.state = DECODED_HANDS[encoded_state]
             self.alive = 1
-            self.state = encoded_state - 8
     
     def print_hand(self):
         print(f"      living: {self.alive}")
@@ -0,0 +1,90 @@
+import random
+
+from agent import *
+
+# League training: each episode the agent plays an opponent drawn from a pool of
+# frozen greedy snapshots plus the uniform random opponent. Opponents the agent
+# still loses to are drawn more often: weight = (1 - win rate) ** exponent + floor,
+# with the win rate smoothed as (wins + 1) / (games + 2).
+
+
+class OpponentPool:
+    def __init__(self, opponents=(), include_random=True, exponent=2.0, floor=0.05, max_snapshots=None, seed=None):
+        self.opponents = []
+        self.wins = []
+        self.games = []
+        self.exponent = exponent
+        self.floor = floor
+        self.max_snapshots = max_snapshots
+        # own generator so pool draws do not shift the game's random stream
+        self.rng = random.Random(seed)
+        if include_random:
+            self.add(RandomOpponent())
+        for opponent in opponents:
+            self.add(opponent)
+
+    def add(self, opponent):
+        self.opponents.append(opponent)
+        self.wins.append(0)
+        self.games.append(0)
+        if self.max_snapshots is not None:
+            snapshots = [i for i, o in enumerate(self.opponents) if isinstance(o, GreedyOpponent)]
+            if len(snapshots) > self.max_snapshots:
+                # drop the oldest frozen snapshot
+                oldest = snapshots[0]
+                del self.opponents[oldest], self.wins[oldest], self.games[oldest]
+
+    def win_rate(self, i):
+        return (self.wins[i] + 1) / (self.games[i] + 2)
+
+    def weights(self):
+        return [(1 - self.win_rate(i)) ** self.exponent + self.floor for i in range(len(self.opponents))]
+
+    def sample(self):
+        return self.rng.choices(range(len(self.opponents)), weights=self.weights())[0]
+
+    def record(self, i, won):
+        self.games[i] += 1
+        self.wins[i] += won
+
+    def summary(self):
+        weights = self.weights()
+        total = sum(weights)
+        return [
+            {'opponent': o.name, 'games': self.games[i], 'win_rate': self.win_rate(i), 'weight': weights[i] / total}
+            for i, o in enumerate(self.opponents)
+        ]
+
+
+def train_league(agent, num_episodes=1000, snapshot_paths=(), include_random=True, snapshot_every=None,
+                 max_snapshots=None, seed=None, exponent=2.0, floor=0.05):
+    # snapshot_paths: Q-tables (or compiled policy files) frozen into greedy opponents at load time.
+    # snapshot_every: also freeze the agent itself into the pool every N episodes.
+    opponents = []
+    for path in snapshot_paths:
+        opponents.append(GreedyOpponent.from_file(path))
+        print(f"Opponent compiled from {path} ({len(opponents[-1].policy)} states).")
+    pool = OpponentPool(opponents, include_random, exponent, floor, max_snapshots, seed)
+    if not pool.opponents:
+        raise ValueError("Opponent pool is empty")
+
+    wins = 0
+    draws = 0
+    for episode in range(num_episodes):
+        i = pool.sample()
+        opponent = pool.opponents[i]
+        won, drew = agent.play_episode(episode, None if isinstance(opponent, RandomOpponent) else opponent)
+        pool.record(i, won)
+        wins += won
+        draws += drew
+
+        if snapshot_every and (episode + 1) % snapshot_every == 0:
+            pool.add(agent.snapshot_policy(f"snapshot@{episode + 1}"))
+
+        # metrics, checkpoints and progress exactly as train_q_learning
+        if agent.end_episode(episode, won, drew, wins, draws):
+            for entry in pool.summary():
+                print(f"   {entry['opponent']}: {entry['win_rate']:.2f} over {entry['games']} games (p={entry['weight']:.2f})")
+
+    agent.end_training()
+    return {'episodes': num_episodes, 'wins': wins, 'draws': draws, 'pool': pool.summary()}
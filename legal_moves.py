@@ -0,0 +1,99 @@
+import hashlib
+import inspect
+import os
+import pickle
+
+from atomic_file import *
+from game import *
+
+# next to this module, so the cache does not depend on the caller's working directory
+LEGAL_MOVES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'legal_moves.pkl')
+
+# LEGAL_MOVES[state_to_index(state)] = tuple of valid action ids, filled on first use
+LEGAL_MOVES = []
+
+
+def build_legal_move_table():
+    # Run the reference move generator (get_valid_actions rules) once per encoded state
+    if not ID_TO_ACTION:
+        load_actions_from_file()
+    game = Game()
+    interned = {}
+    table = []
+    for index in range(NUM_STATES):
+        game.set_game_state(index_to_state(index))
+        player = game.players[game.current_player]
+        opponent = game.players[1 - game.current_player]
+        ids = tuple(action_to_id(action) for action in list_valid_actions(player, opponent))
+        # most states share one of a few hundred move lists, keep a single copy of each
+        table.append(interned.setdefault(ids, ids))
+    return table
+
+
+def catalog_signature():
+    return catalog_version()
+
+
+def rules_version():
+    # hash of the code that decides the legal moves: the move generator and hand
+    # predicates (actions.py), hand and player decoding and Game.set_game_state
+    import actions
+    import hands
+    import player
+
+    source = ''.join(inspect.getsource(obj) for obj in (actions, hands, player, Game.set_game_state, index_to_state))
+    return hashlib.sha256(source.encode()).hexdigest()[:16]
+
+
+def _read_cache(filename):
+    # any unreadable, truncated or foreign file is a cache miss
+    try:
+        with open(filename, 'rb') as f:
+            return pickle.load(f)
+    except Exception:
+        return None
+
+
+def _write_cache(filename, data):
+    # atomic_write, so concurrent builders never see a torn file
+    try:
+        with atomic_write(filename) as f:
+            pickle.dump(data, f)
+    except OSError:
+        # a read-only install still works, it just rebuilds every run
+        pass
+
+
+def load_legal_move_table(filename=LEGAL_MOVES_FILE, rebuild=False):
+    if not ID_TO_ACTION:
+        load_actions_from_file()
+    signature = catalog_signature()
+    rules = rules_version()
+
+    table = None
+    if not rebuild and filename and os.path.exists(filename):
+        data = _read_cache(filename)
+        # a cache built against a different action catalog or move rules is stale
+        if (isinstance(data, dict) and data.get('actions') == signature and data.get('rules') == rules
+                and len(data.get('moves', [])) == NUM_STATES):
+            table = data['moves']
+
+    if table is None:
+        table = build_legal_move_table()
+        if filename:
+            _write_cache(filename, {'actions': signature, 'rules': rules, 'moves': table})
+
+    LEGAL_MOVES[:] = table
+    return LEGAL_MOVES
+
+
+def get_valid_action_ids(state):
+    if not LEGAL_MOVES:
+        load_legal_move_table()
+    return LEGAL_MOVES[state_to_index(state)]
+
+
+def get_valid_action_ids_by_index(index):
+    if not LEGAL_MOVES:
+        load_legal_move_table()
+    return LEGAL_MOVES[index]
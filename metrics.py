@@ -0,0 +1,74 @@
+import json
+import time
+from collections import deque
+
+# Training instrumentation for Agent. Pass Agent(metrics=TrainingMetrics(...));
+# with metrics=None the training loop skips every timer and counter.
+
+PHASES = ['legal_moves', 'select_action', 'apply_action', 'opponent_simulation', 'checkpoint']
+
+
+class TrainingMetrics:
+    def __init__(self, path='training_metrics.jsonl', interval=100, window=1000):
+        # path=None keeps the numbers in memory only (see snapshot())
+        self.path = path
+        self.interval = interval
+        self.phase_seconds = dict.fromkeys(PHASES, 0.0)
+        self.phase_calls = dict.fromkeys(PHASES, 0)
+        self.episodes = 0
+        self.steps = 0
+        self.wins = 0
+        self.draws = 0
+        self.new_q_entries = 0
+        # 1 for a win, 0 otherwise, over the last `window` episodes
+        self.recent_results = deque(maxlen=window)
+        self.started = time.perf_counter()
+        self.last_emit = self.started
+        self.last_emit_steps = 0
+
+    def add_time(self, phase, seconds):
+        self.phase_seconds[phase] += seconds
+        self.phase_calls[phase] += 1
+
+    def end_episode(self, won, drew):
+        self.episodes += 1
+        self.wins += won
+        self.draws += drew
+        self.recent_results.append(1 if won else 0)
+        if self.episodes % self.interval == 0:
+            self.emit()
+
+    def rolling_win_rate(self):
+        if not self.recent_results:
+            return 0.0
+        return sum(self.recent_results) / len(self.recent_results)
+
+    def snapshot(self):
+        now = time.perf_counter()
+        elapsed = now - self.started
+        since_emit = now - self.last_emit
+        return {
+            'episodes': self.episodes,
+            'steps': self.steps,
+            'wins': self.wins,
+            'draws': self.draws,
+            'new_q_entries': self.new_q_entries,
+            'win_rate': self.wins / self.episodes if self.episodes else 0.0,
+            'rolling_win_rate': self.rolling_win_rate(),
+            'rolling_window': len(self.recent_results),
+            'elapsed_seconds': elapsed,
+            'steps_per_sec': (self.steps - self.last_emit_steps) / since_emit if since_emit > 0 else 0.0,
+            'phase_seconds': dict(self.phase_seconds),
+            'phase_calls': dict(self.phase_calls),
+            # training time not covered by a phase timer (bookkeeping, Q updates, ...)
+            'untimed_seconds': elapsed - sum(self.phase_seconds.values()),
+        }
+
+    def emit(self):
+        record = self.snapshot()
+        self.last_emit = time.perf_counter()
+        self.last_emit_steps = self.steps
+        if self.path:
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(record) + '\n')
+        return record
@@ -0,0 +1,47 @@
+from engine import *
+
+# Exact distribution of where a uniformly random opponent leaves the game.
+#
+# update_q_table's 'sample' mode plays one random opponent line from the state
+# after the agent's move until the agent is to move again. This computes every
+# such line at once: the agent's next decision states and their probabilities.
+# Opponent-only cycles (redistribute -> form -> redistribute ...) are followed
+# until the probability still in flight drops below `tolerance`.
+
+# state_index -> tuple of (state_tuple, valid_action_ids, probability)
+OPPONENT_RESPONSES = {}
+
+
+def opponent_responses(state_index, tolerance=1e-12):
+    cached = OPPONENT_RESPONSES.get(state_index)
+    if cached is not None:
+        return cached
+
+    # the player who just moved; the opponent is to move in state_index
+    player = 1 - current_player(state_index)
+    outcomes = {}
+    frontier = {state_index: 1.0}
+    while frontier and sum(frontier.values()) > tolerance:
+        next_frontier = {}
+        for index, mass in frontier.items():
+            action_ids = get_valid_action_ids_by_index(index)
+            if not action_ids or is_done(index):
+                outcomes[index] = outcomes.get(index, 0.0) + mass
+                continue
+            share = mass / len(action_ids)
+            for action_id in action_ids:
+                next_index = step(index, action_id)
+                if current_player(next_index) == player or is_done(next_index):
+                    outcomes[next_index] = outcomes.get(next_index, 0.0) + share
+                else:
+                    next_frontier[next_index] = next_frontier.get(next_index, 0.0) + share
+        frontier = next_frontier
+
+    # renormalize over the mass dropped with the last frontier
+    total = sum(outcomes.values())
+    responses = tuple(
+        (index_to_state(index), get_valid_action_ids_by_index(index), mass / total)
+        for index, mass in sorted(outcomes.items())
+    )
+    OPPONENT_RESPONSES[state_index] = responses
+    return responses
@@ -0,0 +1,35 @@
+import random
+
+from policy import *
+
+# Opponent policies for the training loop. Each has select_action(state, action_ids)
+# and is only ever asked for the player that is not being trained.
+
+
+class RandomOpponent:
+    name = 'random'
+
+    def select_action(self, state, action_ids):
+        return random.choice(action_ids)
+
+
+class GreedyOpponent:
+    # frozen greedy policy (a CompiledPolicy), one array lookup per move
+    def __init__(self, policy, name='greedy'):
+        self.policy = policy
+        self.name = name
+
+    @classmethod
+    def from_q_table(cls, Q, name='greedy', symmetric=None):
+        return cls(CompiledPolicy.from_q_table(Q, symmetric, name), name)
+
+    @classmethod
+    def from_file(cls, filename, symmetric=None):
+        # a compiled policy file, or a Q-table (pickle or shared_q.py export) to compile.
+        # Q-tables record whether they are symmetric; symmetric is only needed for files that do not.
+        if is_policy_file(filename):
+            return cls(CompiledPolicy.open(filename), filename)
+        return cls.from_q_table(load_q_lookup(filename, symmetric), filename)
+
+    def select_action(self, state, action_ids):
+        return self.policy.select_action(state, action_ids)
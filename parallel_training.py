@@ -0,0 +1,154 @@
+import multiprocessing
+import os
+import random
+
+from agent import *
+
+# Parallel self-play for Agent.train_q_learning.
+# Each worker process keeps its own copy of the Q-table. Every round the
+# coordinator hands each worker a block of sync_interval episodes plus the
+# entries merged in the previous round, so all copies start the round equal
+# to the master table. Workers return the values they wrote and how often
+# they wrote them, and the coordinator merges them weighted by those counts.
+# With agent.recorder set, workers also send back the moves they played, and the
+# coordinator appends them to the recorder in episode order.
+# With agent.metrics set, workers count their steps and the coordinator feeds the
+# episodes, in order, to the same metrics stream as train_q_learning. Phase timers
+# cover the coordinator only (checkpoints); worker time shows in elapsed_seconds.
+
+
+def _episode_seed(seed, round_index, worker_index):
+    # string seeds go through sha512, so this is stable across processes and runs
+    return f"{seed}:{round_index}:{worker_index}"
+
+
+def _worker_loop(conn, q_snapshot, agent_params, opponent_q_path, record, measure):
+    agent = Agent(q_table_src=None, **agent_params)
+    agent.Q = make_q_table(agent.q_backend, q_snapshot)
+    if record:
+        agent.recorder = TrajectoryBuffer()
+    opponent = None
+    if opponent_q_path and os.path.exists(opponent_q_path):
+        opponent = GreedyOpponent.from_file(opponent_q_path)
+
+    while True:
+        task = conn.recv()
+        if task is None:
+            break
+        first_episode, num_episodes, seed, merged = task
+        for (state, action_id), value in merged.items():
+            agent.set_q_value(state, action_id, value)
+
+        random.seed(seed)
+        agent.visit_counts = {}
+        if measure:
+            agent.metrics = TrainingMetrics(path=None)
+        results = [agent.play_episode(episode, opponent)
+                   for episode in range(first_episode, first_episode + num_episodes)]
+        updates = {key: (agent.Q[key], count) for key, count in agent.visit_counts.items()}
+        agent.visit_counts = None
+        steps = agent.metrics.steps if measure else 0
+        conn.send((results, updates, agent.recorder.take() if record else None, steps))
+    conn.close()
+
+
+def merge_updates(worker_updates):
+    # visit-weighted mean of the values each worker wrote for a key
+    totals = {}
+    for updates in worker_updates:
+        for key, (value, count) in updates.items():
+            weighted, visits = totals.get(key, (0.0, 0))
+            totals[key] = (weighted + value * count, visits + count)
+    return {key: weighted / visits for key, (weighted, visits) in totals.items()}
+
+
+def train_parallel(agent, num_episodes=1000, num_workers=None, sync_interval=100, seed=0, opponent_q_path=None):
+    # Results depend only on (seed, num_workers, sync_interval), not on process scheduling.
+    num_workers = num_workers or os.cpu_count() or 1
+    agent_params = {
+        'alpha': agent.alpha,
+        'gamma': agent.gamma,
+        'epsilon': agent.epsilon,
+        'q_backend': 'dict',
+        'update_mode': agent.update_mode,
+        'symmetric': agent.symmetric,
+    }
+    q_snapshot = to_q_dict(agent.Q)
+
+    ctx = multiprocessing.get_context()
+    workers = []
+    for _ in range(num_workers):
+        parent_conn, child_conn = ctx.Pipe()
+        process = ctx.Process(target=_worker_loop,
+                              args=(child_conn, q_snapshot, agent_params, opponent_q_path, agent.recorder is not None,
+                                    agent.metrics is not None))
+        process.daemon = True
+        process.start()
+        child_conn.close()
+        workers.append((process, parent_conn))
+
+    wins = 0
+    draws = 0
+    played = 0
+    merged = {}
+    round_index = 0
+    try:
+        while played < num_episodes:
+            remaining = num_episodes - played
+            tasks = []
+            first_episode = played
+            for worker_index in range(num_workers):
+                count = min(sync_interval, remaining)
+                if count <= 0:
+                    break
+                tasks.append((first_episode, count, _episode_seed(seed, round_index, worker_index), merged))
+                first_episode += count
+                remaining -= count
+
+            for (_, conn), task in zip(workers, tasks):
+                conn.send(task)
+            # idle workers still need this round's merged entries to stay in sync
+            for _, conn in workers[len(tasks):]:
+                conn.send((0, 0, None, merged))
+
+            outcomes = []
+            worker_updates = []
+            steps = 0
+            for _, conn in workers:
+                results, updates, records, worker_steps = conn.recv()
+                outcomes.extend(results)
+                steps += worker_steps
+                worker_updates.append(updates)
+                # workers hold consecutive episode blocks, so this keeps episode order
+                if records is not None:
+                    agent.recorder.extend(records)
+
+            merged = merge_updates(worker_updates)
+            for (state, action_id), value in merged.items():
+                agent.set_q_value(state, action_id, value)
+
+            # same running totals and metrics as train_q_learning, in episode order
+            if agent.metrics is not None:
+                agent.metrics.steps += steps
+            checkpoint = False
+            for won, drew in outcomes:
+                wins += won
+                draws += drew
+                played += 1
+                if agent.metrics is not None:
+                    agent.metrics.end_episode(won, drew)
+                if played % 100 == 0:
+                    checkpoint = True
+                    print(f"Wins/Games: {wins}/{played} ({draws} Draws)")
+            if checkpoint:
+                agent.checkpoint()
+            round_index += 1
+    finally:
+        for process, conn in workers:
+            conn.send(None)
+            conn.close()
+        for process, _ in workers:
+            process.join()
+
+    agent.end_training()
+    return {'episodes': played, 'wins': wins, 'draws': draws}
@@ -1,19 +1,37 @@
 from hands import *
 
 class Player:
+    __slots__ = ('hands',)
+
     def __init__(self):
-        self.left = Hand()
-        self.right = Hand()
+        # one tuple for the player's lifetime, so get_hands() does not allocate
+        self.hands = (Hand(), Hand())
+
+    @property
+    def left(self):
+        return self.hands[0]
+
+    @left.setter
+    def left(self, hand):
+        self.hands = (hand, self.hands[1])
+
+    @property
+    def right(self):
+        return self.hands[1]
+
+    @right.setter
+    def right(self, hand):
+        self.hands = (self.hands[0], hand)
 
     def get_hands(self):
-        return [self.left, self.right]
+        return self.hands
 
     def encode_state(self):
-        return [hand.encode_state() for hand in self.get_hands()]
+        return [self.hands[0].encode_state(), self.hands[1].encode_state()]
     
     def apply_encoded_state(self, encoded_state):
-        self.left.set_as_encoded_state(encoded_state[0])
-        self.right.set_as_encoded_state(encoded_state[1])
+        self.hands[0].set_as_encoded_state(encoded_state[0])
+        self.hands[1].set_as_encoded_state(encoded_state[1])
 
     def print_player(self):
         print('   left: ')
@@ -23,4 +41,4 @@ class Player:
 
 
     def is_alive(self):
-        return any(hand.alive for hand in self.get_hands())
+        return bool(self.hands[0].alive or self.hands[1].alive)
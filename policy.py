@@ -0,0 +1,151 @@
+import os
+import random
+import sys
+
+import numpy as np
+
+from legal_moves import *
+from shared_q import *
+from symmetry import *
+
+# Compiled greedy policies.
+#
+# compile step: for every encoded state, the legal action ids (get_valid_actions
+# rules) whose Q value is highest, unstored entries counting as 0.0 like
+# Agent.select_action. Ties are all kept. The result is two arrays:
+#
+#   offsets   uint32 [NUM_STATES + 1]  best ids of state index i are best_ids[offsets[i]:offsets[i + 1]]
+#   best_ids  uint8                    the tied best action ids, grouped by state, in legal move order
+#
+# Saved as a small header plus the two arrays and opened with a memory map, so
+# loading takes microseconds. Picking a move is one offsets lookup plus a random
+# tie break with the same random.choice draw the dict-based selection used.
+#
+# Tables trained with Agent(symmetric=True) are expanded to every concrete state at
+# compile time, so the arrays never need canonicalizing; the header records it.
+#
+#   python policy.py q_table.pkl policy.bin [--symmetric]    (--symmetric only for files that do not record it)
+
+POLICY_MAGIC = b'SGPOL\x00\x00\x03'
+# magic, action count, length of best_ids, action catalog version, compiled from a canonical-only
+# table, padding that keeps the arrays aligned
+POLICY_HEADER = np.dtype([('magic', 'S8'), ('n_actions', '<u4'), ('n_best', '<u4'), ('catalog', 'S16'),
+                          ('symmetric', 'u1'), ('reserved', 'V7')])
+
+
+def _dense_values(Q):
+    # float64 [NUM_STATES, n_actions] with 0.0 for unstored entries
+    if isinstance(Q, DenseQTable):
+        return Q.table.astype(np.float64)
+    if isinstance(Q, SharedQTable):
+        return np.where(Q.present, Q.values, 0.0)
+    values = np.zeros((NUM_STATES, num_actions()))
+    Q = to_q_dict(Q)
+    if Q:
+        rows = np.fromiter((state_to_index(s) for s, _ in Q), dtype=np.int64, count=len(Q))
+        cols = np.fromiter((a for _, a in Q), dtype=np.int64, count=len(Q))
+        values[rows, cols] = np.fromiter(Q.values(), dtype=np.float64, count=len(Q))
+    return values
+
+
+def _legal_move_ranks():
+    # rank[index, action_id] = position of the action in LEGAL_MOVES[index]
+    if not LEGAL_MOVES:
+        load_legal_move_table()
+    rank = np.zeros((NUM_STATES, len(ID_TO_ACTION)), dtype=np.int64)
+    for index, action_ids in enumerate(LEGAL_MOVES):
+        rank[index, list(action_ids)] = np.arange(len(action_ids))
+    return rank
+
+
+def is_policy_file(filename):
+    with open(filename, 'rb') as f:
+        return f.read(len(POLICY_MAGIC)) == POLICY_MAGIC
+
+
+class CompiledPolicy:
+    def __init__(self, offsets, best_ids, name='policy', symmetric=False):
+        self.offsets = offsets
+        self.best_ids = best_ids
+        self.name = name
+        self.symmetric = symmetric
+
+    @classmethod
+    def from_q_table(cls, Q, symmetric=None, name='policy'):
+        # symmetric=True: Q holds canonical states only (Agent(symmetric=True)).
+        # Tables that know it (load_q_lookup results, shared exports) need no flag,
+        # and refuse one that disagrees.
+        import engine
+
+        saved = getattr(Q, 'symmetric', None)
+        check_symmetric(name, saved, symmetric)
+        symmetric = bool(saved if saved is not None else symmetric)
+        if isinstance(Q, SymmetricQLookup):
+            Q = Q.table
+        values = _dense_values(Q)
+        legal = engine.legal_mask_table()
+        if symmetric:
+            # value of (state, a) is the canonical entry of its mirror image
+            rows = np.zeros(NUM_STATES, dtype=np.int64)
+            permutations = np.zeros((NUM_STATES, legal.shape[1]), dtype=np.int64)
+            for index in np.flatnonzero(legal.any(axis=1)).tolist():
+                canonical, to_canonical, _ = canonical_form(index_to_state(index))
+                rows[index] = state_to_index(canonical)
+                permutations[index] = to_canonical
+            values = values[rows[:, None], permutations]
+        values = np.where(legal, values, -np.inf)
+        best = legal & (values == values.max(axis=1, keepdims=True))
+        offsets = np.zeros(NUM_STATES + 1, dtype=np.uint32)
+        np.cumsum(best.sum(axis=1), out=offsets[1:])
+        # grouped by state, ties in get_valid_action_ids order so random.choice picks the same move
+        rows, cols = np.nonzero(best)
+        best_ids = cols[np.lexsort((_legal_move_ranks()[rows, cols], rows))].astype(np.uint8)
+        return cls(offsets, best_ids, name, symmetric)
+
+    @classmethod
+    def open(cls, filename):
+        buffer = np.memmap(filename, dtype=np.uint8, mode='r')
+        header = np.ndarray((), dtype=POLICY_HEADER, buffer=buffer)
+        if bytes(header['magic']) != POLICY_MAGIC:
+            raise ValueError(f"Not a compiled policy: {filename}")
+        if bytes(header['catalog']).decode() != catalog_version():
+            raise ValueError(f"{filename} was compiled for action catalog {bytes(header['catalog']).decode()}, "
+                             f"this catalog is {catalog_version()}")
+        offsets = np.ndarray(NUM_STATES + 1, dtype='<u4', buffer=buffer, offset=POLICY_HEADER.itemsize)
+        best_ids = np.ndarray(int(header['n_best']), dtype=np.uint8, buffer=buffer,
+                              offset=POLICY_HEADER.itemsize + offsets.nbytes)
+        return cls(offsets, best_ids, filename, bool(header['symmetric']))
+
+    def save(self, filename):
+        header = np.zeros((), dtype=POLICY_HEADER)
+        header['magic'] = POLICY_MAGIC
+        header['n_actions'] = num_actions()
+        header['n_best'] = len(self.best_ids)
+        header['catalog'] = catalog_version().encode()
+        header['symmetric'] = self.symmetric
+        with atomic_write(filename) as f:
+            f.write(header.tobytes())
+            f.write(self.offsets.astype('<u4').tobytes())
+            f.write(self.best_ids.tobytes())
+
+    def best_actions(self, state):
+        index = state_to_index(state)
+        return self.best_ids[self.offsets[index]:self.offsets[index + 1]].tolist()
+
+    def select_action(self, state, action_ids=None):
+        # action_ids is accepted for the opponent interface, the legal moves are compiled in
+        index = state_to_index(state)
+        start = int(self.offsets[index])
+        return int(self.best_ids[start + random.randrange(int(self.offsets[index + 1]) - start)])
+
+    def __len__(self):
+        # states with at least one legal move
+        return int(np.count_nonzero(np.diff(self.offsets)))
+
+
+if __name__ == '__main__':
+    if len(sys.argv) not in (3, 4):
+        sys.exit('usage: python policy.py q_table.pkl policy.bin [--symmetric]')
+    policy = CompiledPolicy.from_q_table(load_q_lookup(sys.argv[1], True if sys.argv[3:] == ['--symmetric'] else None))
+    policy.save(sys.argv[2])
+    print(f"Compiled {len(policy)} states, {len(policy.best_ids)} best actions into {sys.argv[2]}")
@@ -0,0 +1,274 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from collections import OrderedDict, deque
+
+from legal_moves import *
+from q_tables import *
+from shared_q import *
+
+# Long-lived inference server for a trained Q-table.
+#
+# Newline-delimited JSON over TCP or a Unix socket:
+#   {"state": [1, 1, 1, 1, 0]}        -> {"state": [...], "best_actions": [...], "value": q,
+#                                         "action_values": [[action_id, q], ...]}
+#   {"cmd": "reload"}                 -> re-reads the table file, open connections keep working
+#   {"cmd": "reload", "path": "..."}  -> swaps in another table, only for files under --reload-dir
+#
+# The table can be a pickle or a shared_q.py export, which is memory-mapped
+# instead of unpickled, so several servers share one copy. Tables trained with
+# Agent(symmetric=True) are answered for any state through their canonical entries.
+#   {"cmd": "stats"}                  -> request counts, cache hits and latency percentiles
+#
+#   python policy_server.py serve --q-table q_table.pkl --port 8765 [--reload-dir tables/]
+#   python policy_server.py bench --port 8765 --requests 20000 --concurrency 16
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    rank = min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    return sorted_values[rank]
+
+
+def latency_summary(latencies):
+    ordered = sorted(latencies)
+    return {
+        'count': len(ordered),
+        'p50_ms': percentile(ordered, 0.50) * 1000,
+        'p90_ms': percentile(ordered, 0.90) * 1000,
+        'p99_ms': percentile(ordered, 0.99) * 1000,
+        'max_ms': (ordered[-1] if ordered else 0.0) * 1000,
+    }
+
+
+def check_q_lookup(path, Q):
+    # a file that unpickles to something other than a Q mapping would fail every later query
+    table = Q.table if isinstance(Q, SymmetricQLookup) else Q
+    if isinstance(table, SharedQTable):
+        return Q
+    if not isinstance(table, dict):
+        raise ValueError(f"{path} does not hold a Q-table ({type(table).__name__})")
+    for key in table:
+        if not (isinstance(key, tuple) and len(key) == 2 and isinstance(key[0], tuple) and len(key[0]) == 5):
+            raise ValueError(f"{path} does not hold a Q-table (key {key!r})")
+        break
+    return Q
+
+
+def load_checked_q_lookup(path):
+    return check_q_lookup(path, load_q_lookup(path))
+
+
+class PolicyServer:
+    def __init__(self, q_table_path='q_table.pkl', cache_size=10000, latency_window=100000, reload_dir=None):
+        self.q_table_path = q_table_path
+        # clients may only name tables under this directory; None pins reloads to q_table_path
+        self.reload_dir = reload_dir
+        self.cache_size = cache_size
+        # state tuple -> encoded response line, most recently used last
+        self.cache = OrderedDict()
+        self.latencies = deque(maxlen=latency_window)
+        self.requests = 0
+        self.cache_hits = 0
+        self.reloads = 0
+        self.Q = {}
+        self.server = None
+
+    def load(self, path=None):
+        self.q_table_path = path or self.q_table_path
+        self.Q = load_checked_q_lookup(self.q_table_path)
+        self.cache.clear()
+        if not LEGAL_MOVES:
+            load_legal_move_table()
+
+    def reload_path(self, path=None):
+        # the client triggers the reload, the server decides which files it may read
+        if path is None:
+            return self.q_table_path
+        if self.reload_dir is None:
+            raise ValueError("reload paths are fixed by the server, send {\"cmd\": \"reload\"} without a path")
+        root = os.path.realpath(self.reload_dir)
+        resolved = os.path.realpath(os.path.join(root, path))
+        if os.path.commonpath([root, resolved]) != root:
+            raise ValueError(f"{path} is outside the reload directory")
+        return resolved
+
+    async def reload(self, path=None):
+        # unpickle off the event loop, then swap the table in one assignment.
+        # Any failure leaves the current table in place and is reported to the client.
+        try:
+            path = self.reload_path(path)
+            Q = await asyncio.get_running_loop().run_in_executor(None, load_checked_q_lookup, path)
+        except Exception as e:
+            return {'error': f"reload failed: {e}"}
+        self.Q = Q
+        self.q_table_path = path
+        self.cache.clear()
+        self.reloads += 1
+        return {'reloaded': path, 'entries': len(Q)}
+
+    def best_actions(self, state):
+        action_ids = get_valid_action_ids(state)
+        Q = self.Q
+        action_values = [[a, Q.get((state, a), 0.0)] for a in action_ids]
+        if not action_values:
+            return {'state': list(state), 'best_actions': [], 'value': None, 'action_values': []}
+        best = max(q for _, q in action_values)
+        return {
+            'state': list(state),
+            'best_actions': [a for a, q in action_values if q == best],
+            'value': best,
+            'action_values': action_values,
+        }
+
+    def query(self, state):
+        line = self.cache.get(state)
+        if line is not None:
+            self.cache.move_to_end(state)
+            self.cache_hits += 1
+            return line
+        line = (json.dumps(self.best_actions(state)) + '\n').encode()
+        self.cache[state] = line
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return line
+
+    def stats(self):
+        return {
+            'q_table': self.q_table_path,
+            'entries': len(self.Q),
+            'symmetric': getattr(self.Q, 'symmetric', False),
+            'requests': self.requests,
+            'cache_hits': self.cache_hits,
+            'cache_size': len(self.cache),
+            'reloads': self.reloads,
+            'latency': latency_summary(self.latencies),
+        }
+
+    async def handle_line(self, line):
+        try:
+            request = json.loads(line)
+            command = request.get('cmd')
+            if command == 'reload':
+                return (json.dumps(await self.reload(request.get('path'))) + '\n').encode()
+            if command == 'stats':
+                return (json.dumps(self.stats()) + '\n').encode()
+            state = tuple(int(code) for code in request['state'])
+            if len(state) != 5 or not all(0 <= code < NUM_HAND_CODES for code in state[:4]) or state[4] not in (0, 1):
+                raise ValueError(f"Not an encoded game state: {list(state)}")
+            self.requests += 1
+            return self.query(state)
+        except (ValueError, KeyError, TypeError, AttributeError, OSError) as e:
+            return (json.dumps({'error': str(e)}) + '\n').encode()
+
+    async def handle_client(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                started = time.perf_counter()
+                writer.write(await self.handle_line(line))
+                self.latencies.append(time.perf_counter() - started)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host='127.0.0.1', port=8765, unix_path=None):
+        self.load()
+        if unix_path:
+            self.server = await asyncio.start_unix_server(self.handle_client, path=unix_path)
+        else:
+            self.server = await asyncio.start_server(self.handle_client, host, port)
+        return self.server
+
+    async def serve_forever(self, host='127.0.0.1', port=8765, unix_path=None):
+        server = await self.start(host, port, unix_path)
+        print(f"Serving {self.q_table_path} ({len(self.Q)} entries) on {unix_path or f'{host}:{port}'}")
+        async with server:
+            await server.serve_forever()
+
+
+async def _open(host, port, unix_path):
+    if unix_path:
+        return await asyncio.open_unix_connection(unix_path)
+    return await asyncio.open_connection(host, port)
+
+
+async def request(host='127.0.0.1', port=8765, payload=None, unix_path=None):
+    # one-off request on a fresh connection, returns the decoded response
+    reader, writer = await _open(host, port, unix_path)
+    writer.write((json.dumps(payload) + '\n').encode())
+    await writer.drain()
+    response = json.loads(await reader.readline())
+    writer.close()
+    await writer.wait_closed()
+    return response
+
+
+async def run_load(host='127.0.0.1', port=8765, num_requests=10000, concurrency=8, states=None, unix_path=None, seed=0):
+    # load generator: `concurrency` connections each sending requests back to back
+    if states is None:
+        import engine
+        states = [index_to_state(int(i)) for i in engine.reachable_states() if not engine.is_done(int(i))]
+    rng = random.Random(seed)
+    payloads = [(json.dumps({'state': list(rng.choice(states))}) + '\n').encode() for _ in range(num_requests)]
+    latencies = []
+    errors = 0
+
+    async def client(worker_payloads):
+        nonlocal errors
+        reader, writer = await _open(host, port, unix_path)
+        for payload in worker_payloads:
+            started = time.perf_counter()
+            writer.write(payload)
+            await writer.drain()
+            response = await reader.readline()
+            latencies.append(time.perf_counter() - started)
+            if b'"error"' in response:
+                errors += 1
+        writer.close()
+        await writer.wait_closed()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client(payloads[i::concurrency]) for i in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        'requests': num_requests,
+        'concurrency': concurrency,
+        'errors': errors,
+        'seconds': elapsed,
+        'requests_per_sec': num_requests / elapsed,
+        'latency': latency_summary(latencies),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve a Q-table policy or load-test a running server.')
+    parser.add_argument('mode', choices=['serve', 'bench'])
+    parser.add_argument('--q-table', default='q_table.pkl')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--unix', help='Unix socket path instead of TCP')
+    parser.add_argument('--cache-size', type=int, default=10000)
+    parser.add_argument('--reload-dir', help='let clients reload any table under this directory')
+    parser.add_argument('--requests', type=int, default=10000)
+    parser.add_argument('--concurrency', type=int, default=8)
+    args = parser.parse_args(argv)
+
+    if args.mode == 'serve':
+        server = PolicyServer(args.q_table, cache_size=args.cache_size, reload_dir=args.reload_dir)
+        asyncio.run(server.serve_forever(args.host, args.port, args.unix))
+    else:
+        result = asyncio.run(run_load(args.host, args.port, args.requests, args.concurrency, unix_path=args.unix))
+        print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,200 @@
+import os
+import pickle
+
+import numpy as np
+
+from atomic_file import *
+from game import *
+
+Q_BACKENDS = ['dict', 'dense']
+
+
+def num_actions():
+    if not ID_TO_ACTION:
+        load_actions_from_file()
+    return len(ID_TO_ACTION)
+
+
+class DenseQTable:
+    # Q values in a float32 array indexed by (state_to_index(state), action_id).
+    # Supports the parts of the dict interface Agent uses, keyed by (state_tuple, action_id).
+    def __init__(self, n_actions=None):
+        if n_actions is None:
+            n_actions = num_actions()
+        self.n_actions = n_actions
+        self.table = np.zeros((NUM_STATES, n_actions), dtype=np.float32)
+        # which entries have been written, so len()/items() match the dict table
+        self.visited = np.zeros((NUM_STATES, n_actions), dtype=bool)
+        self.count = 0
+        self._bind_views()
+
+    def _bind_views(self):
+        # flat memoryviews over the same arrays for the per-step scalar reads and writes:
+        # entry (index, action_id) is at index * n_actions + action_id, and a memoryview
+        # item is a plain Python float/bool, several times cheaper than NumPy scalar indexing
+        self.flat_values = memoryview(self.table.reshape(-1))
+        self.flat_visited = memoryview(self.visited.reshape(-1))
+
+    def __getstate__(self):
+        return {'table': self.table, 'visited': self.visited, 'count': self.count}
+
+    def __setstate__(self, state):
+        self.table = state['table']
+        self.visited = state['visited']
+        self.count = state['count']
+        self.n_actions = self.table.shape[1]
+        self._bind_views()
+
+    @classmethod
+    def from_dict(cls, Q, n_actions=None):
+        q_table = cls(n_actions)
+        if Q:
+            rows = np.fromiter((state_to_index(s) for s, _ in Q), dtype=np.int64, count=len(Q))
+            cols = np.fromiter((a for _, a in Q), dtype=np.int64, count=len(Q))
+            q_table.table[rows, cols] = np.fromiter(Q.values(), dtype=np.float64, count=len(Q))
+            q_table.visited[rows, cols] = True
+            q_table.count = int(q_table.visited.sum())
+        return q_table
+
+    def to_dict(self):
+        return dict(self.items())
+
+    def get(self, key, default=0.0):
+        offset = state_to_index(key[0]) * self.n_actions + key[1]
+        if self.flat_visited[offset]:
+            return self.flat_values[offset]
+        return default
+
+    def __getitem__(self, key):
+        offset = state_to_index(key[0]) * self.n_actions + key[1]
+        if not self.flat_visited[offset]:
+            raise KeyError(key)
+        return self.flat_values[offset]
+
+    def __setitem__(self, key, value):
+        self.set_at(state_to_index(key[0]), key[1], value)
+
+    def get_at(self, index, action_id, default=0.0):
+        # get() by state index
+        offset = index * self.n_actions + action_id
+        if self.flat_visited[offset]:
+            return self.flat_values[offset]
+        return default
+
+    def set_at(self, index, action_id, value):
+        # __setitem__ by state index
+        offset = index * self.n_actions + action_id
+        if not self.flat_visited[offset]:
+            self.flat_visited[offset] = True
+            self.count += 1
+        self.flat_values[offset] = value
+
+    def set_many(self, rows, cols, values):
+        # vectorized __setitem__ by state index; a repeated (row, col) keeps its last value.
+        # Returns the number of entries that were not stored before.
+        fresh = np.unique((rows.astype(np.int64) * self.table.shape[1] + cols)[~self.visited[rows, cols]])
+        self.table[rows, cols] = values
+        self.visited[rows, cols] = True
+        self.count += len(fresh)
+        return len(fresh)
+
+    def __contains__(self, key):
+        return self.flat_visited[state_to_index(key[0]) * self.n_actions + key[1]]
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        return self.keys()
+
+    def keys(self):
+        for index, action_id in zip(*np.nonzero(self.visited)):
+            yield (index_to_state(int(index)), int(action_id))
+
+    def values(self):
+        return self.table[self.visited].tolist()
+
+    def items(self):
+        rows, cols = np.nonzero(self.visited)
+        for index, action_id, value in zip(rows.tolist(), cols.tolist(), self.table[rows, cols].tolist()):
+            yield ((index_to_state(index), action_id), value)
+
+    def q_values(self, state, action_ids):
+        return self.q_values_at(state_to_index(state), action_ids)
+
+    def q_values_at(self, index, action_ids):
+        # unvisited entries are 0.0, the same default Agent passes to dict.get
+        values = self.flat_values
+        base = index * self.n_actions
+        return [values[base + a] for a in action_ids]
+
+    def state_action_values(self, state):
+        index = state_to_index(state)
+        action_ids = np.nonzero(self.visited[index])[0]
+        return list(zip(action_ids.tolist(), self.table[index, action_ids].tolist()))
+
+    def top_n(self, n, player=None, largest=True):
+        # partial selection over the stored entries, only the n winners get sorted
+        mask = self.visited
+        if player is not None:
+            mask = mask & (np.arange(NUM_STATES) % 2 == player)[:, None]
+        rows, cols = np.nonzero(mask)
+        values = self.table[rows, cols]
+        k = min(n, len(values))
+        if k <= 0:
+            return []
+        keys = -values if largest else values
+        chosen = np.argpartition(keys, k - 1)[:k]
+        chosen = chosen[np.argsort(keys[chosen], kind='stable')]
+        return [((index_to_state(int(rows[i])), int(cols[i])), float(values[i])) for i in chosen]
+
+    def nbytes(self):
+        return self.table.nbytes + self.visited.nbytes
+
+
+def make_q_table(backend='dict', entries=None):
+    if backend == 'dict':
+        return entries if entries is not None else {}
+    if backend == 'dense':
+        return DenseQTable.from_dict(entries or {})
+    raise ValueError(f"Unknown Q-table backend: {backend} (expected one of {Q_BACKENDS})")
+
+
+def to_q_dict(Q):
+    return Q if isinstance(Q, dict) else Q.to_dict()
+
+
+def load_q_file(filename):
+    # (Q, symmetric) from a save_q_dict pickle; symmetric is None when the file does not
+    # record it (legacy raw dicts and tables saved before it was stored)
+    with open(filename, 'rb') as f:
+        data = pickle.load(f)
+    if isinstance(data, dict) and 'action_catalog' in data and 'q_table' in data:
+        if data['action_catalog'] != catalog_version():
+            raise ValueError(f"{filename} was trained with action catalog {data['action_catalog']}, "
+                             f"this catalog is {catalog_version()}")
+        return data['q_table'], data.get('symmetric')
+    return data, None
+
+
+def check_symmetric(filename, saved, symmetric):
+    # symmetric=None accepts either; a recorded flag that disagrees with the caller's is refused,
+    # since canonical-only tables read as concrete ones (or the reverse) give wrong values silently
+    if symmetric is not None and saved is not None and bool(saved) != bool(symmetric):
+        raise ValueError(f"{filename} was saved with symmetric={bool(saved)}, not symmetric={bool(symmetric)}")
+
+
+def load_q_dict(filename, symmetric=None):
+    # accepts the versioned format written by save_q_dict and legacy raw dicts
+    Q, saved = load_q_file(filename)
+    check_symmetric(filename, saved, symmetric)
+    return Q
+
+
+def save_q_dict(filename, Q, symmetric=False):
+    # always written as the plain {(state, action_id): value} dict, whatever the backend,
+    # next to the action catalog version it was trained with and whether it holds
+    # canonical states only (Agent(symmetric=True)).
+    # Written with atomic_write, so a crash never leaves a half-written table.
+    with atomic_write(filename) as f:
+        pickle.dump({'action_catalog': catalog_version(), 'symmetric': bool(symmetric), 'q_table': to_q_dict(Q)}, f)
@@ -0,0 +1,81 @@
+import numpy as np
+
+from q_tables import *
+
+# Experience replay for Agent. Transitions live in preallocated NumPy arrays
+# used as a ring buffer, so memory is fixed at construction and adding a
+# transition only writes one row:
+#
+#   state       int32    state_to_index of the state the evaluated player acted in
+#   action      int16    action id
+#   reward      float32
+#   next_state  int32    state the evaluated player acts in next
+#   next_mask   bool     legal actions in next_state
+#   done        bool     no bootstrap from next_state
+#
+# replay_ratio is how many replayed transitions each stored transition pays for;
+# minibatches of batch_size are drawn as that credit comes due, once the buffer
+# holds at least min_size transitions.
+#
+#   agent = Agent(q_backend='dense', replay=ReplayBuffer(100000, batch_size=64, replay_ratio=4))
+
+
+class ReplayBuffer:
+    def __init__(self, capacity=100000, batch_size=32, replay_ratio=1.0, min_size=None, seed=None, n_actions=None):
+        if n_actions is None:
+            n_actions = num_actions()
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.replay_ratio = replay_ratio
+        self.min_size = batch_size if min_size is None else min_size
+        self.states = np.zeros(capacity, dtype=np.int32)
+        self.actions = np.zeros(capacity, dtype=np.int16)
+        self.rewards = np.zeros(capacity, dtype=np.float32)
+        self.next_states = np.zeros(capacity, dtype=np.int32)
+        self.next_masks = np.zeros((capacity, n_actions), dtype=bool)
+        self.dones = np.zeros(capacity, dtype=bool)
+        # next slot to write and number of filled slots
+        self.position = 0
+        self.size = 0
+        self.added = 0
+        self.credit = 0.0
+        self.rng = np.random.default_rng(seed)
+
+    def add(self, state_index, action_id, reward, next_index, next_action_ids, done):
+        i = self.position
+        self.states[i] = state_index
+        self.actions[i] = action_id
+        self.rewards[i] = reward
+        self.next_states[i] = next_index
+        self.next_masks[i] = False
+        self.next_masks[i, next_action_ids] = True
+        self.dones[i] = done
+        self.position = (i + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+        self.added += 1
+        self.credit += self.replay_ratio
+
+    def batches_due(self):
+        # minibatches owed by the transitions added since the last call
+        if self.size < self.min_size:
+            return 0
+        due = int(self.credit // self.batch_size)
+        self.credit -= due * self.batch_size
+        return due
+
+    def sample(self, batch_size=None):
+        i = self.rng.integers(0, self.size, batch_size or self.batch_size)
+        return self.states[i], self.actions[i], self.rewards[i], self.next_states[i], self.next_masks[i], self.dones[i]
+
+    def nbytes(self):
+        return sum(a.nbytes for a in (self.states, self.actions, self.rewards, self.next_states, self.next_masks, self.dones))
+
+    def __len__(self):
+        return self.size
+
+
+def replay_targets(table, rewards, next_states, next_masks, dones, gamma):
+    # reward + gamma * max over the legal actions of next_state, reward alone when done
+    future = np.where(next_masks, table[next_states], -np.inf).max(axis=1)
+    future[~next_masks.any(axis=1) | dones] = 0.0
+    return rewards + gamma * future
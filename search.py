@@ -0,0 +1,224 @@
+import math
+import time
+from collections import OrderedDict
+
+from legal_moves import *
+from symmetry import *
+
+# Search-based player for live play.
+#
+# Iterative deepening over Game.set_game_state/apply_action under a per-move
+# time budget. 'minimax' assumes the opponent plays its best reply (alpha-beta),
+# 'expectimax' assumes the uniform random opponent used in training. Values are
+# from player 0's point of view: a win is 1, a loss -1, and every move discounts
+# by gamma so faster wins score higher. Players can move several times in a row
+# (form choices), so max/min nodes follow the mover, not the ply parity.
+#
+# An optional Q-table (Agent.Q, a pickle, a shared_q.py export) orders moves and
+# evaluates the leaves of an unfinished search; Q values are from the mover's
+# point of view, like training stores them.
+#
+# The transposition table is keyed by game_state() tuples, holds at most tt_size
+# entries and drops the least recently used. It is kept between moves, so each
+# search starts from the previous move's results.
+#
+#   player = SearchPlayer(agent.Q, time_budget=0.05)
+#   action_id = player.select_action(state, get_valid_action_ids(state))
+#   player.last_search['nodes_per_sec']
+
+SEARCH_MODES = ['minimax', 'expectimax']
+
+# transposition table bounds
+EXACT, LOWER, UPPER = 0, 1, 2
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+class SearchPlayer:
+    def __init__(self, Q=None, mode='minimax', time_budget=0.05, max_depth=64, tt_size=200000, gamma=0.99,
+                 symmetric=False, name='search'):
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Unknown search mode: {mode} (expected one of {SEARCH_MODES})")
+        self.Q = Q
+        self.mode = mode
+        self.time_budget = time_budget
+        self.max_depth = max_depth
+        self.tt_size = tt_size
+        self.gamma = gamma
+        self.symmetric = symmetric
+        self.name = name
+        # state tuple -> (depth, value, bound, best action id), least recently used first
+        self.tt = OrderedDict()
+        # expectimax values depend on which player is searching
+        self.tt_player = None
+        self.game = Game()
+        self.player = 0
+        self.deadline = math.inf
+        self.nodes = 0
+        self.tt_hits = 0
+        self.total_nodes = 0
+        self.total_seconds = 0.0
+        self.last_search = None
+
+    @classmethod
+    def from_agent(cls, agent, **kwargs):
+        return cls(agent.Q, symmetric=agent.symmetric, **kwargs)
+
+    def q_value(self, state, action_id):
+        if self.symmetric:
+            state, action_id = canonicalize(state, action_id)
+        return self.Q.get((state, action_id), 0.0)
+
+    def expand(self, state):
+        # (action_id, next state, winner or None) for every legal move
+        game = self.game
+        children = []
+        for action_id in get_valid_action_ids(state):
+            game.set_game_state(state)
+            game.apply_action(ID_TO_ACTION[action_id])
+            children.append((action_id, game.game_state(), game.get_winner() if game.is_done() else None))
+        return children
+
+    def evaluate(self, state):
+        # leaf value: the mover's best Q value, 0 without a table
+        if self.Q is None:
+            return 0.0
+        action_ids = get_valid_action_ids(state)
+        if not action_ids:
+            return 0.0
+        value = max(self.q_value(state, a) for a in action_ids)
+        return value if state[4] == 0 else -value
+
+    def order(self, state, children, best_action):
+        if self.Q is not None:
+            children.sort(key=lambda child: self.q_value(state, child[0]), reverse=True)
+        if best_action is not None:
+            for i, child in enumerate(children):
+                if child[0] == best_action:
+                    children.insert(0, children.pop(i))
+                    break
+        return children
+
+    def store(self, state, depth, value, bound, best_action):
+        self.tt[state] = (depth, value, bound, best_action)
+        self.tt.move_to_end(state)
+        if len(self.tt) > self.tt_size:
+            self.tt.popitem(last=False)
+
+    def search_node(self, state, depth, alpha, beta):
+        self.nodes += 1
+        if self.nodes & 255 == 0 and time.perf_counter() > self.deadline:
+            raise SearchTimeout()
+
+        best_action = None
+        entry = self.tt.get(state)
+        if entry is not None:
+            self.tt.move_to_end(state)
+            entry_depth, value, bound, best_action = entry
+            if entry_depth >= depth and (bound == EXACT or (bound == LOWER and value >= beta)
+                                         or (bound == UPPER and value <= alpha)):
+                self.tt_hits += 1
+                return value
+        if depth == 0:
+            return self.evaluate(state)
+        children = self.expand(state)
+        if not children:
+            return 0.0
+        self.order(state, children, best_action)
+
+        gamma = self.gamma
+        mover = state[4]
+        if self.mode == 'expectimax' and mover != self.player:
+            # chance node: the random opponent picks each move with equal probability
+            total = 0.0
+            for action_id, child, winner in children:
+                if winner is not None:
+                    total += gamma * (1.0 if winner == 0 else -1.0)
+                else:
+                    total += gamma * self.search_node(child, depth - 1, -math.inf, math.inf)
+            value = total / len(children)
+            self.store(state, depth, value, EXACT, children[0][0])
+            return value
+
+        maximizing = mover == 0
+        alpha_orig, beta_orig = alpha, beta
+        value = -math.inf if maximizing else math.inf
+        best_action = children[0][0]
+        for action_id, child, winner in children:
+            if winner is not None:
+                child_value = gamma * (1.0 if winner == 0 else -1.0)
+            else:
+                child_value = gamma * self.search_node(child, depth - 1, alpha / gamma, beta / gamma)
+            if maximizing:
+                if child_value > value:
+                    value, best_action = child_value, action_id
+                alpha = max(alpha, value)
+            else:
+                if child_value < value:
+                    value, best_action = child_value, action_id
+                beta = min(beta, value)
+            if alpha >= beta:
+                break
+        if value <= alpha_orig:
+            bound = UPPER
+        elif value >= beta_orig:
+            bound = LOWER
+        else:
+            bound = EXACT
+        self.store(state, depth, value, bound, best_action)
+        return value
+
+    def search(self, state):
+        started = time.perf_counter()
+        self.player = state[4]
+        if self.mode == 'expectimax' and self.tt_player != self.player:
+            self.tt.clear()
+            self.tt_player = self.player
+        self.nodes = 0
+        self.tt_hits = 0
+        action_ids = get_valid_action_ids(state)
+        best_action = action_ids[0] if action_ids else None
+        value = 0.0
+        depth = 0
+        if len(action_ids) > 1:
+            for depth_limit in range(1, self.max_depth + 1):
+                # the first iteration always finishes, so there is a searched move to return
+                self.deadline = math.inf if depth_limit == 1 else started + self.time_budget
+                try:
+                    value = self.search_node(state, depth_limit, -math.inf, math.inf)
+                except SearchTimeout:
+                    break
+                entry = self.tt.get(state)
+                if entry is not None:
+                    best_action = entry[3]
+                depth = depth_limit
+                if time.perf_counter() > started + self.time_budget:
+                    break
+        seconds = time.perf_counter() - started
+        self.total_nodes += self.nodes
+        self.total_seconds += seconds
+        self.last_search = {
+            'action': best_action,
+            # from the mover's point of view
+            'value': value if self.player == 0 else -value,
+            'depth': depth,
+            'nodes': self.nodes,
+            'seconds': seconds,
+            'nodes_per_sec': self.nodes / seconds if seconds > 0 else 0.0,
+            'tt_hits': self.tt_hits,
+            'tt_size': len(self.tt),
+        }
+        return self.last_search
+
+    def select_action(self, state, action_ids=None):
+        return self.search(state)['action']
+
+    def stats(self):
+        return {
+            'nodes': self.total_nodes,
+            'seconds': self.total_seconds,
+            'nodes_per_sec': self.total_nodes / self.total_seconds if self.total_seconds > 0 else 0.0,
+            'tt_size': len(self.tt),
+        }
@@ -0,0 +1,186 @@
+import os
+import sys
+
+import numpy as np
+
+from q_tables import *
+from symmetry import *
+
+# Read-only Q-table that many processes can share without copying.
+#
+# The table is two arrays indexed by (state_to_index(state), action_id): float64
+# values (exact copies of the pickled floats) and a presence mask, so
+# get(key, default) behaves like dict.get on the pickled table. They live in one
+# file that every process memory-maps read-only, so the page cache holds a single
+# copy however many workers attach (put it under /dev/shm to keep it in RAM).
+# Attaching maps the pages, nothing is read or unpickled.
+#
+#   export_shared_q(load_q_dict('q_table.pkl'), 'q_table.qmap')
+#   Q = SharedQTable.open('q_table.qmap')             # in each worker
+#
+# Tables trained with Agent(symmetric=True) hold canonical states only. The flag
+# is recorded in pickles and exports, and load_q_lookup wraps such tables in a
+# SymmetricQLookup, so lookups by concrete state are mapped to the canonical entry.
+#
+#   python shared_q.py q_table.pkl q_table.qmap
+
+SHARED_Q_MAGIC = b'SGQMAP\x00\x03'
+# magic, action count, stored entry count, action catalog version, canonical states only,
+# padding that keeps the arrays 8-byte aligned
+SHARED_Q_HEADER = np.dtype([('magic', 'S8'), ('n_actions', '<u4'), ('count', '<u4'), ('catalog', 'S16'),
+                            ('symmetric', 'u1'), ('reserved', 'V7')])
+
+
+def _layout(n_actions):
+    # byte offsets of the values and mask arrays and the total size
+    values_offset = SHARED_Q_HEADER.itemsize
+    mask_offset = values_offset + NUM_STATES * n_actions * 8
+    return values_offset, mask_offset, mask_offset + NUM_STATES * n_actions
+
+
+def _fill(buffer, Q, n_actions, symmetric):
+    values_offset, mask_offset, _ = _layout(n_actions)
+    values = np.ndarray((NUM_STATES, n_actions), dtype='<f8', buffer=buffer, offset=values_offset)
+    present = np.ndarray((NUM_STATES, n_actions), dtype=bool, buffer=buffer, offset=mask_offset)
+    values[:] = 0.0
+    present[:] = False
+    if Q:
+        Q = to_q_dict(Q)
+        rows = np.fromiter((state_to_index(s) for s, _ in Q), dtype=np.int64, count=len(Q))
+        cols = np.fromiter((a for _, a in Q), dtype=np.int64, count=len(Q))
+        values[rows, cols] = np.fromiter(Q.values(), dtype=np.float64, count=len(Q))
+        present[rows, cols] = True
+    header = np.ndarray((), dtype=SHARED_Q_HEADER, buffer=buffer)
+    header['magic'] = SHARED_Q_MAGIC
+    header['n_actions'] = n_actions
+    header['count'] = int(present.sum())
+    header['catalog'] = catalog_version().encode()
+    header['symmetric'] = bool(symmetric)
+
+
+def export_shared_q(Q, filename, symmetric=False):
+    # symmetric: Q holds canonical states only (also taken from SymmetricQLookup/SharedQTable tables).
+    # Written with atomic_write, like save_q_dict
+    symmetric = symmetric or getattr(Q, 'symmetric', False)
+    n_actions = num_actions()
+    size = _layout(n_actions)[2]
+    with atomic_write(filename) as f:
+        f.truncate(size)
+        buffer = np.memmap(f, dtype=np.uint8, mode='r+', shape=(size,))
+        _fill(buffer, Q, n_actions, symmetric)
+        buffer.flush()
+        del buffer
+
+
+def is_shared_q_file(filename):
+    with open(filename, 'rb') as f:
+        return f.read(len(SHARED_Q_MAGIC)) == SHARED_Q_MAGIC
+
+
+class SharedQTable:
+    # dict-style read access: get, [], in, len, q_values; writes are not supported
+    def __init__(self, buffer, filename=None):
+        header = np.ndarray((), dtype=SHARED_Q_HEADER, buffer=buffer)
+        if bytes(header['magic']) != SHARED_Q_MAGIC:
+            raise ValueError("Not a shared Q-table")
+        if bytes(header['catalog']).decode() != catalog_version():
+            raise ValueError(f"Shared Q-table {filename} was exported with action catalog "
+                             f"{bytes(header['catalog']).decode()}, this catalog is {catalog_version()}")
+        self.n_actions = int(header['n_actions'])
+        self.count = int(header['count'])
+        self.symmetric = bool(header['symmetric'])
+        values_offset, mask_offset, _ = _layout(self.n_actions)
+        self.values = np.ndarray((NUM_STATES, self.n_actions), dtype='<f8', buffer=buffer, offset=values_offset)
+        self.present = np.ndarray((NUM_STATES, self.n_actions), dtype=bool, buffer=buffer, offset=mask_offset)
+        self.values.flags.writeable = False
+        self.present.flags.writeable = False
+        self.filename = filename
+
+    @classmethod
+    def open(cls, filename):
+        return cls(np.memmap(filename, dtype=np.uint8, mode='r'), filename)
+
+    def get(self, key, default=0.0):
+        index = state_to_index(key[0])
+        if self.present[index, key[1]]:
+            return float(self.values[index, key[1]])
+        return default
+
+    def __getitem__(self, key):
+        index = state_to_index(key[0])
+        if not self.present[index, key[1]]:
+            raise KeyError(key)
+        return float(self.values[index, key[1]])
+
+    def __contains__(self, key):
+        return bool(self.present[state_to_index(key[0]), key[1]])
+
+    def __len__(self):
+        return self.count
+
+    def items(self):
+        rows, cols = np.nonzero(self.present)
+        for index, action_id, value in zip(rows.tolist(), cols.tolist(), self.values[rows, cols].tolist()):
+            yield ((index_to_state(index), action_id), value)
+
+    def to_dict(self):
+        return dict(self.items())
+
+    def q_values(self, state, action_ids):
+        # unstored entries are 0.0, like Agent's dict.get default
+        row = self.values[state_to_index(state)]
+        present = self.present[state_to_index(state)]
+        return [float(row[a]) if present[a] else 0.0 for a in action_ids]
+
+
+class SymmetricQLookup:
+    # read-only view of a canonical-only table (Agent(symmetric=True)) keyed by concrete states
+    symmetric = True
+
+    def __init__(self, table):
+        self.table = table
+
+    def get(self, key, default=0.0):
+        return self.table.get(canonicalize(*key), default)
+
+    def __getitem__(self, key):
+        return self.table[canonicalize(*key)]
+
+    def __contains__(self, key):
+        return canonicalize(*key) in self.table
+
+    def __len__(self):
+        return len(self.table)
+
+    def q_values(self, state, action_ids):
+        state, to_canonical, _ = canonical_form(state)
+        return [self.table.get((state, to_canonical[a]), 0.0) for a in action_ids]
+
+    def to_dict(self):
+        # the stored canonical entries, as saved
+        return to_q_dict(self.table)
+
+
+def load_q_lookup(filename, symmetric=None):
+    # read-only table for lookups: attaches exported files, unpickles anything else.
+    # Tables recorded as symmetric come back wrapped in a SymmetricQLookup;
+    # symmetric=True/False refuses a file recorded with the other setting and is
+    # assumed for files that do not record it.
+    if is_shared_q_file(filename):
+        Q = SharedQTable.open(filename)
+        saved = Q.symmetric
+    else:
+        Q, saved = load_q_file(filename)
+    check_symmetric(filename, saved, symmetric)
+    if saved is None:
+        saved = symmetric
+    if saved:
+        return SymmetricQLookup(Q)
+    return Q
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        sys.exit('usage: python shared_q.py q_table.pkl q_table.qmap')
+    Q, symmetric = load_q_file(sys.argv[1])
+    export_shared_q(Q, sys.argv[2], bool(symmetric))
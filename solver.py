@@ -0,0 +1,92 @@
+import time
+
+import numpy as np
+
+from engine import *
+from q_tables import *
+
+# Exact values for the whole reachable game graph by value iteration.
+#
+# Every edge (state, action) -> next_state comes from engine.transition_table(),
+# which is built from Game.reset() with get_valid_actions / Game.apply_action.
+# Values are from the point of view of the player to move, like Agent.Q:
+#   Q(s, a) = +1 / -1         if next_state ends the game (win / loss)
+#           = gamma * U(next) otherwise
+# U(s) is the max over the player's own moves, and over the opponent's moves
+# either the min ('minimax') or the mean ('random', the uniform opponent
+# train_q_learning plays against). Discounting every ply keeps the update a
+# contraction, so the redistribute/form loops in the rules still converge.
+
+OPPONENT_MODELS = ['minimax', 'random']
+
+
+def _edges():
+    transitions = transition_table()
+    states, action_ids = np.nonzero(transitions >= 0)
+    next_states = transitions[states, action_ids]
+    return states, action_ids, next_states
+
+
+def solve(opponent='minimax', gamma=0.95, tolerance=1e-9, max_iterations=10000):
+    if opponent not in OPPONENT_MODELS:
+        raise ValueError(f"Unknown opponent model: {opponent} (expected one of {OPPONENT_MODELS})")
+    started = time.perf_counter()
+
+    # np.nonzero walks rows in order, so edges are already grouped by state
+    states, action_ids, next_states = _edges()
+    sources, starts, counts = np.unique(states, return_index=True, return_counts=True)
+    movers = sources % 2
+    next_done = STATE_DONE[next_states]
+    next_winner = STATE_WINNER[next_states]
+
+    values = np.zeros((2, NUM_STATES))
+    edge_values = np.zeros((2, len(states)))
+    iterations = 0
+    converged = False
+    while iterations < max_iterations:
+        iterations += 1
+        delta = 0.0
+        for player in (0, 1):
+            edge_values[player] = np.where(
+                next_done,
+                np.where(next_winner == player, 1.0, -1.0),
+                gamma * values[player, next_states],
+            )
+            best = np.maximum.reduceat(edge_values[player], starts)
+            if opponent == 'minimax':
+                reply = np.minimum.reduceat(edge_values[player], starts)
+            else:
+                reply = np.add.reduceat(edge_values[player], starts) / counts
+            updated = np.where(movers == player, best, reply)
+            delta = max(delta, float(np.abs(updated - values[player, sources]).max()))
+            values[player, sources] = updated
+        if delta < tolerance:
+            converged = True
+            break
+
+    # each edge is scored for the player who moves in its source state
+    q_values = edge_values[states % 2, np.arange(len(states))]
+    Q = {
+        (index_to_state(int(s)), int(a)): float(v)
+        for s, a, v in zip(states, action_ids, q_values)
+    }
+    stats = {
+        'opponent': opponent,
+        'gamma': gamma,
+        'reachable_states': int(len(reachable_states())),
+        'states_solved': int(len(sources)),
+        'terminal_states': int(STATE_DONE[reachable_states()].sum()),
+        'q_entries': len(Q),
+        'iterations': iterations,
+        'converged': converged,
+        'seconds': time.perf_counter() - started,
+        'initial_value': float(values[0, INITIAL_STATE]),
+    }
+    return Q, stats
+
+
+def solve_to_file(filename, opponent='minimax', **kwargs):
+    # writes the same pickle format as Agent.save_q_table, so Agent(q_table_src=filename) loads it
+    Q, stats = solve(opponent, **kwargs)
+    save_q_dict(filename, Q)
+    return stats
@@ -0,0 +1,100 @@
+from game import *
+
+# Left/right hand symmetry.
+#
+# Swapping either player's two hands gives a position with the same value, so
+# each game_state() tuple has up to four mirror images. The canonical
+# representative is the smallest of them, and actions are renamed to match:
+# a swap of the mover's hands exchanges hand indices 0 and 1 in source/targets,
+# a swap of the opponent's hands exchanges 2 and 3. Redistribute actions only
+# name values, so they map to themselves (the resulting positions are mirror
+# images of each other, which is all the values need).
+# The one asymmetric rule: when both of the mover's hands wait for a form
+# choice, the left hand is always resolved first, so the mover's hands are
+# not swapped in that case.
+
+# transform -> (swap player 0's hands, swap player 1's hands)
+TRANSFORMS = [(False, False), (True, False), (False, True), (True, True)]
+
+PENDING_CODES = (6, 7, 10, 11)
+
+# state tuple -> (canonical state, concrete -> canonical action ids, canonical -> concrete action ids)
+_CANONICAL = {}
+# (mover swap, opponent swap) -> (permutation, inverse permutation)
+_ACTION_PERMUTATIONS = {}
+
+
+def transform_state(state, transform):
+    swap0, swap1 = TRANSFORMS[transform]
+    a, b, c, d, player = state
+    if swap0:
+        a, b = b, a
+    if swap1:
+        c, d = d, c
+    return (a, b, c, d, player)
+
+
+def _swap_hand_index(index, swap_mover, swap_opponent):
+    if swap_mover and index in (0, 1):
+        return 1 - index
+    if swap_opponent and index in (2, 3):
+        return 5 - index
+    return index
+
+
+def action_permutation(swap_mover, swap_opponent):
+    key = (swap_mover, swap_opponent)
+    if key not in _ACTION_PERMUTATIONS:
+        if not ID_TO_ACTION:
+            load_actions_from_file()
+        permutation = [0] * len(ID_TO_ACTION)
+        for action_id, action in ID_TO_ACTION.items():
+            source = action.source
+            if source is not None:
+                source = _swap_hand_index(source, swap_mover, swap_opponent)
+            targets = sorted(_swap_hand_index(t, swap_mover, swap_opponent) for t in action.targets)
+            mirrored = Action(action.action_type, source=source, targets=targets, params=action.params)
+            permutation[action_id] = ACTION_TO_ID[mirrored]
+        inverse = [0] * len(permutation)
+        for action_id, mirrored_id in enumerate(permutation):
+            inverse[mirrored_id] = action_id
+        _ACTION_PERMUTATIONS[key] = (tuple(permutation), tuple(inverse))
+    return _ACTION_PERMUTATIONS[key]
+
+
+def canonical_form(state):
+    # (canonical state, to_canonical, from_canonical) where to_canonical[action_id]
+    # is the matching action in the canonical state and from_canonical undoes it
+    cached = _CANONICAL.get(state)
+    if cached is not None:
+        return cached
+    best_transform = 0
+    best_state = state
+    player = state[4]
+    mover_pending = state[2 * player] in PENDING_CODES and state[2 * player + 1] in PENDING_CODES
+    for transform in range(1, len(TRANSFORMS)):
+        if mover_pending and TRANSFORMS[transform][player]:
+            continue
+        candidate = transform_state(state, transform)
+        if candidate < best_state:
+            best_state = candidate
+            best_transform = transform
+    swap0, swap1 = TRANSFORMS[best_transform]
+    swap_mover, swap_opponent = (swap0, swap1) if player == 0 else (swap1, swap0)
+    to_canonical, from_canonical = action_permutation(swap_mover, swap_opponent)
+    cached = (best_state, to_canonical, from_canonical)
+    _CANONICAL[state] = cached
+    return cached
+
+
+def canonical_state(state):
+    return canonical_form(state)[0]
+
+
+def canonicalize(state, action_id):
+    canonical, to_canonical, _ = canonical_form(state)
+    return canonical, to_canonical[action_id]
+
+
+def from_canonical_action(state, canonical_action_id):
+    return canonical_form(state)[2][canonical_action_id]
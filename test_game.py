@@ -0,0 +1,213 @@
+import random
+
+import pytest
+
+from legal_moves import *
+
+
+def test_state_index_round_trip():
+    for index in range(0, NUM_STATES, 7):
+        state = index_to_state(index)
+        assert state_to_index(state) == index
+
+        game = Game()
+        game.set_game_state(state)
+        assert game.game_state() == state
+
+
+def test_legal_move_table_matches_get_valid_actions():
+    load_legal_move_table(filename=None)
+    rng = random.Random(0)
+    game = Game()
+    for _ in range(500):
+        state = index_to_state(rng.randrange(NUM_STATES))
+        game.set_game_state(state)
+        player = game.players[game.current_player]
+        opponent = game.players[1 - game.current_player]
+        expected = get_valid_actions(player, opponent)['encoded']
+        assert list(get_valid_action_ids(state)) == expected
+
+
+def test_legal_move_cache_recovers_from_bad_files(tmp_path):
+    import pickle
+
+    filename = str(tmp_path / 'legal_moves.pkl')
+    expected = list(load_legal_move_table(filename=None))
+    with open(filename, 'wb') as f:
+        f.write(b'\x80\x04truncated')
+    assert load_legal_move_table(filename) == expected
+    with open(filename, 'rb') as f:
+        data = pickle.load(f)
+    assert data['rules'] == rules_version() and data['moves'] == expected
+    assert os.listdir(tmp_path) == ['legal_moves.pkl']
+
+    # a cache written under other move rules is rebuilt, not served
+    data['rules'] = 'stale'
+    data['moves'] = [()] * NUM_STATES
+    with open(filename, 'wb') as f:
+        pickle.dump(data, f)
+    assert load_legal_move_table(filename) == expected
+
+
+def test_engine_step_matches_apply_action():
+    import engine
+
+    rng = random.Random(1)
+    for _ in range(200):
+        game = Game()
+        index = state_to_index(game.reset())
+        assert index == engine.INITIAL_STATE
+        for _ in range(300):
+            if game.is_done():
+                break
+            action_id = rng.choice(get_valid_action_ids(game.game_state()))
+            game.apply_action(ID_TO_ACTION[action_id])
+            index = engine.step(index, action_id)
+            assert index_to_state(index) == game.game_state()
+            assert engine.current_player(index) == game.current_player
+            assert engine.is_done(index) == game.is_done()
+            assert engine.get_winner(index) == game.get_winner()
+
+
+def test_batch_game_matches_game():
+    import numpy as np
+    from batch_game import BatchGame, sample_random_actions
+
+    rng = np.random.default_rng(2)
+    batch = BatchGame(16, max_turns=None)
+    games = [Game() for _ in range(16)]
+    finished = 0
+    for _ in range(150):
+        mask = batch.legal_mask()
+        for game, row in zip(games, mask):
+            player = game.players[game.current_player]
+            opponent = game.players[1 - game.current_player]
+            expected = get_valid_actions(player, opponent)['encoded']
+            assert sorted(np.flatnonzero(row).tolist()) == sorted(expected)
+
+        action_ids = sample_random_actions(mask, rng)
+        result = batch.step(action_ids)
+        for i, game in enumerate(games):
+            game.apply_action(ID_TO_ACTION[int(action_ids[i])])
+            assert index_to_state(int(result['states'][i])) == game.game_state()
+            assert result['done'][i] == game.is_done()
+            assert result['winner'][i] == game.get_winner()
+            if game.is_done():
+                finished += 1
+                games[i] = Game()
+    assert finished > 0
+    assert [index_to_state(int(s)) for s in batch.states] == [g.game_state() for g in games]
+
+
+def test_snapshot_restore_and_clone():
+    rng = random.Random(4)
+    game = Game()
+    game.reset(evaluated_player=1)
+    snapshots = []
+    for _ in range(40):
+        if game.is_done():
+            break
+        snapshots.append((game.snapshot(), game.game_state()))
+        game.apply_action(ID_TO_ACTION[rng.choice(get_valid_action_ids(game.game_state()))])
+
+    hands = [hand for player in game.players for hand in player.get_hands()]
+    for snapshot, state in snapshots:
+        game.restore(snapshot)
+        assert game.game_state() == state
+        assert game.evaluated_player == 1
+        assert game.clone().game_state() == state
+    # restore reuses the same Hand objects
+    assert [hand for player in game.players for hand in player.get_hands()] == hands
+
+
+def test_symmetry_maps_legal_moves_and_transitions():
+    import engine
+    from symmetry import canonical_form, canonical_state
+
+    transitions = engine.transition_table()
+    for index in engine.reachable_states().tolist()[::3]:
+        state = index_to_state(index)
+        canonical, to_canonical, from_canonical = canonical_form(state)
+        legal = get_valid_action_ids(state)
+        assert sorted(to_canonical[a] for a in legal) == sorted(get_valid_action_ids(canonical))
+        for action_id in legal:
+            assert from_canonical[to_canonical[action_id]] == action_id
+            next_index = int(transitions[index, action_id])
+            mirrored_next = int(transitions[state_to_index(canonical), to_canonical[action_id]])
+            assert canonical_state(index_to_state(next_index)) == canonical_state(index_to_state(mirrored_next))
+
+
+def test_actions_are_interned_and_immutable():
+    import json
+    import pickle
+
+    load_legal_move_table()
+    with open(ACTIONS_FILE) as f:
+        data = json.load(f)
+    for idx_str, action_data in data['id_to_action'].items():
+        action = ID_TO_ACTION[int(idx_str)]
+        assert action.to_dict() == action_data
+        assert Action(**action_data) is action
+        assert action.id == int(idx_str) and ACTION_TO_ID[action] == action.id
+        assert pickle.loads(pickle.dumps(action)) is action
+    action = Action('redistribute', targets=[], params={'values': [2, 3]})
+    assert action is Action('redistribute', params={'values': (2, 3)})
+    with pytest.raises(AttributeError):
+        action.source = 1
+
+    # every legal move goes through its compiled handler
+    game = Game()
+    for action_id in get_valid_action_ids(game.reset()):
+        game.reset()
+        game.apply_action(ID_TO_ACTION[action_id])
+        assert ID_TO_ACTION[action_id].effect is not None
+
+
+def test_action_catalog_loads_once(tmp_path):
+    game = Game()
+    game.reset()
+    for _ in range(3):
+        get_valid_actions(game.players[0], game.players[1])
+    assert len(ALL_ACTIONS) == len(ID_TO_ACTION) == len(ACTION_TO_ID) == 59
+    with pytest.raises(TypeError):
+        ID_TO_ACTION[0] = ID_TO_ACTION[1]
+    with pytest.raises(TypeError):
+        ALL_ACTIONS[0] = ALL_ACTIONS[1]
+    assert catalog_version() == catalog_hash(action.to_dict() for action in build_action_catalog())
+
+
+def test_action_catalog_ignores_working_directory(tmp_path):
+    import os
+    import subprocess
+    import sys
+
+    # a stray actions.json in the working directory is not the catalog
+    (tmp_path / 'actions.json').write_text('{"id_to_action": {"0": {"action_type": "add"}}}')
+    script = 'import actions; print(actions.catalog_version())'
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.abspath(ACTIONS_FILE)))
+    output = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True,
+                            cwd=str(tmp_path), env=env).stdout
+    assert output.strip() == catalog_version()
+
+
+def test_q_tables_record_catalog_version(tmp_path):
+    import pickle
+
+    from q_tables import load_q_dict, save_q_dict
+
+    Q = {((1, 1, 1, 1, 0), 0): 0.5}
+    filename = str(tmp_path / 'q_table.pkl')
+    save_q_dict(filename, Q)
+    with open(filename, 'rb') as f:
+        assert pickle.load(f)['action_catalog'] == catalog_version()
+    assert load_q_dict(filename) == Q
+
+    # tables from before the catalog was versioned load unchanged
+    with open(filename, 'wb') as f:
+        pickle.dump(Q, f)
+    assert load_q_dict(filename) == Q
+
+    with open(filename, 'wb') as f:
+        pickle.dump({'action_catalog': '0000000000000000', 'q_table': Q}, f)
+    with pytest.raises(ValueError):
+        load_q_dict(filename)
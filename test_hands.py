@@ -27,3 +27,10 @@ def test_hand_encodings():
                     print('Encoding issue: ', hand)
                 if form == 1 and encoding != 7:
                     print('Encoding issue: ', hand)
+
+
+def test_hand_decodings():
+    for encoding in range(1, 12):
+        hand = Hand()
+        hand.set_as_encoded_state(encoding)
+        assert hand.encode_state() == encoding
@@ -0,0 +1,97 @@
+import asyncio
+import pickle
+
+from policy_server import *
+
+
+def test_policy_server_queries_and_reloads(tmp_path):
+    first = str(tmp_path / 'first.pkl')
+    second = str(tmp_path / 'second.pkl')
+    start = (1, 1, 1, 1, 0)
+    save_q_dict(first, {(start, 1): 0.5, (start, 2): 0.5})
+    save_q_dict(second, {(start, 3): 0.9})
+    (tmp_path / 'empty.pkl').write_bytes(b'')
+    (tmp_path / 'list.pkl').write_bytes(pickle.dumps([1, 2, 3]))
+
+    async def scenario():
+        server = PolicyServer(first, cache_size=2, reload_dir=str(tmp_path))
+        await server.start(port=0)
+        port = server.server.sockets[0].getsockname()[1]
+
+        reply = await request(port=port, payload={'state': list(start)})
+        assert reply['best_actions'] == [1, 2]
+        assert reply['value'] == 0.5
+        await request(port=port, payload={'state': list(start)})
+        assert server.cache_hits == 1
+
+        assert 'error' in await request(port=port, payload={'state': [1, 1, 1]})
+
+        # a connection opened before the reload keeps working after it
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        assert (await request(port=port, payload={'cmd': 'reload', 'path': second}))['entries'] == 1
+        writer.write((json.dumps({'state': list(start)}) + '\n').encode())
+        await writer.drain()
+        assert json.loads(await reader.readline())['best_actions'] == [3]
+
+        # a failed reload is reported on the same connection and keeps the current table
+        for payload in ({'cmd': 'reload', 'path': 'empty.pkl'}, {'cmd': 'reload', 'path': 'list.pkl'},
+                        {'cmd': 'reload', 'path': '../outside.pkl'}):
+            writer.write((json.dumps(payload) + '\n').encode())
+            await writer.drain()
+            assert 'error' in json.loads(await reader.readline())
+        writer.write((json.dumps({'state': list(start)}) + '\n').encode())
+        await writer.drain()
+        assert json.loads(await reader.readline())['best_actions'] == [3]
+        writer.close()
+
+        load = await run_load(port=port, num_requests=200, concurrency=4)
+        assert load['errors'] == 0
+        stats = await request(port=port, payload={'cmd': 'stats'})
+        assert stats['requests'] == 204
+        assert stats['latency']['count'] >= 204
+
+        server.server.close()
+        await server.server.wait_closed()
+
+    asyncio.run(scenario())
+
+
+def test_policy_server_answers_symmetric_tables(tmp_path):
+    import random
+
+    from agent import Agent
+    from symmetry import canonical_state
+
+    q_path = str(tmp_path / 'q_table.pkl')
+    random.seed(17)
+    agent = Agent(q_table_src=q_path, symmetric=True)
+    agent.train_q_learning(num_episodes=100)
+    agent.save_q_table()
+
+    server = PolicyServer(q_path)
+    server.load()
+    assert server.stats()['symmetric']
+    states = {state for state, _ in agent.Q}
+    mirrored = [s for s in (index_to_state(i) for i in range(NUM_STATES)) if canonical_state(s) in states and s not in states]
+    assert mirrored
+    for state in mirrored[:200]:
+        action_ids = get_valid_action_ids(state)
+        values = agent.q_values(state, action_ids)
+        assert server.best_actions(state)['action_values'] == [[a, q] for a, q in zip(action_ids, values)]
+
+
+def test_policy_server_reloads_only_its_own_table(tmp_path):
+    q_path = str(tmp_path / 'q_table.pkl')
+    other = str(tmp_path / 'other.pkl')
+    start = (1, 1, 1, 1, 0)
+    save_q_dict(q_path, {(start, 1): 0.5})
+    save_q_dict(other, {(start, 3): 0.9})
+
+    server = PolicyServer(q_path)
+    server.load()
+    assert 'error' in asyncio.run(server.reload(other))
+    assert server.best_actions(start)['best_actions'] == [1]
+
+    save_q_dict(q_path, {(start, 2): 0.7})
+    assert asyncio.run(server.reload())['reloaded'] == q_path
+    assert server.best_actions(start)['best_actions'] == [2]
@@ -0,0 +1,48 @@
+import engine
+from search import *
+from tournament import evaluate
+
+
+def _win_in_one():
+    # a reachable state where one legal move ends the game and another does not
+    game = Game()
+    for index in engine.reachable_states().tolist():
+        if engine.is_done(index):
+            continue
+        state = index_to_state(index)
+        outcomes = {}
+        for action_id in get_valid_action_ids(state):
+            outcomes[action_id] = engine.is_done(engine.step(index, action_id))
+        if any(outcomes.values()) and not all(outcomes.values()):
+            return state, outcomes
+
+
+def test_search_finds_win_in_one():
+    state, outcomes = _win_in_one()
+    for mode in SEARCH_MODES:
+        player = SearchPlayer(mode=mode, time_budget=0.01)
+        result = player.search(state)
+        assert outcomes[result['action']]
+        assert result['value'] > 0 and result['depth'] >= 1
+        assert result['nodes'] > 0 and result['nodes_per_sec'] > 0
+
+
+def test_search_player_beats_random_with_bounded_table():
+    # a fixed depth instead of a time budget keeps the result independent of machine speed
+    player = SearchPlayer(time_budget=10.0, max_depth=4, tt_size=500)
+    result = evaluate(player, 'random', num_games=20, batch_size=10, sprt=False)
+    assert result['wins'] >= 17
+    assert player.last_search['depth'] <= 4
+    assert len(player.tt) <= 500
+    assert player.stats()['nodes_per_sec'] > 0
+
+
+def test_search_uses_q_priors():
+    # a table that prefers one move everywhere only changes the order, not the win
+    state, outcomes = _win_in_one()
+    losing = [a for a, done in outcomes.items() if not done][0]
+    Q = {(state, losing): 1.0}
+    player = SearchPlayer(Q, time_budget=0.01)
+    assert outcomes[player.select_action(state, get_valid_action_ids(state))]
+    # depth-1 leaves fall back on the table's values
+    assert player.evaluate(state) == (1.0 if state[4] == 0 else -1.0)
@@ -0,0 +1,88 @@
+import multiprocessing
+import random
+import time
+
+from legal_moves import *
+from shared_q import *
+from symmetry import *
+
+
+def _lookup(args):
+    filename, keys = args
+    Q = SharedQTable.open(filename)
+    return [Q.get(key, None) for key in keys]
+
+
+def test_shared_q_matches_dict_lookups(tmp_path):
+    from agent import Agent
+
+    random.seed(13)
+    agent = Agent(q_table_src=None)
+    agent.train_q_learning(num_episodes=100)
+    Q = agent.Q
+    filename = str(tmp_path / 'q_table.qmap')
+    export_shared_q(Q, filename)
+
+    started = time.perf_counter()
+    shared = load_q_lookup(filename)
+    assert time.perf_counter() - started < 0.5
+    assert isinstance(shared, SharedQTable)
+    assert len(shared) == len(Q)
+    assert shared.to_dict() == Q
+
+    keys = list(Q)[:200] + [((1, 1, 1, 1, 0), a) for a in range(num_actions())]
+    expected = [Q.get(key, None) for key in keys]
+    assert [shared.get(key, None) for key in keys] == expected
+    state = Game().reset()
+    assert shared.q_values(state, get_valid_action_ids(state)) == agent.q_values(state, get_valid_action_ids(state))
+
+    with multiprocessing.get_context().Pool(2) as pool:
+        for result in pool.map(_lookup, [(filename, keys)] * 2):
+            assert result == expected
+
+    # pickles still load as plain dicts
+    save_q_dict(str(tmp_path / 'q_table.pkl'), Q)
+    assert load_q_lookup(str(tmp_path / 'q_table.pkl')) == Q
+
+
+def _mirrored_state(Q):
+    # a concrete state whose canonical form has a nonzero entry, but is not canonical itself
+    for (state, _), value in Q.items():
+        if value == 0.0:
+            continue
+        for transform in range(1, len(TRANSFORMS)):
+            concrete = transform_state(state, transform)
+            if concrete != state and canonical_state(concrete) == state:
+                return concrete
+
+
+def test_symmetric_tables_are_recognized(tmp_path):
+    import pytest
+    from agent import Agent
+    from policy import CompiledPolicy
+
+    q_path = str(tmp_path / 'q_table.pkl')
+    random.seed(17)
+    agent = Agent(q_table_src=q_path, symmetric=True)
+    agent.train_q_learning(num_episodes=100)
+    agent.save_q_table()
+    state = _mirrored_state(agent.Q)
+    action_ids = get_valid_action_ids(state)
+    expected = agent.q_values(state, action_ids)
+    assert any(expected)
+
+    lookup = load_q_lookup(q_path)
+    assert isinstance(lookup, SymmetricQLookup)
+    assert lookup.q_values(state, action_ids) == [lookup.get((state, a)) for a in action_ids] == expected
+    qmap_path = str(tmp_path / 'q_table.qmap')
+    export_shared_q(lookup, qmap_path)
+    assert SharedQTable.open(qmap_path).symmetric
+    assert load_q_lookup(qmap_path).q_values(state, action_ids) == expected
+    assert CompiledPolicy.from_q_table(load_q_lookup(qmap_path)).symmetric
+
+    # a mismatched flag is refused instead of reading canonical entries as concrete ones
+    with pytest.raises(ValueError):
+        load_q_lookup(q_path, symmetric=False)
+    with pytest.raises(ValueError):
+        Agent(q_table_src=q_path)
+    assert Agent(q_table_src=q_path, symmetric=True).q_values(state, action_ids) == expected
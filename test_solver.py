@@ -0,0 +1,26 @@
+import random
+
+from agent import Agent
+from solver import *
+
+
+def test_solver_output_loads_into_agent(tmp_path):
+    q_path = str(tmp_path / 'solved.pkl')
+    stats = solve_to_file(q_path, opponent='random')
+    assert stats['converged']
+    assert stats['states_solved'] + stats['terminal_states'] == stats['reachable_states']
+
+    agent = Agent(q_table_src=q_path, epsilon=0.0, alpha=0.0)
+    assert len(agent.Q) == stats['q_entries']
+    start = Game().reset()
+    for action_id in get_valid_action_ids(start):
+        assert (start, action_id) in agent.Q
+
+    random.seed(0)
+    assert agent.train_q_learning(num_episodes=200)['wins'] > 190
+
+
+def test_minimax_values_are_bounded():
+    Q, stats = solve(opponent='minimax')
+    assert stats['converged']
+    assert all(-1.0 <= value <= 1.0 for value in Q.values())
@@ -0,0 +1,35 @@
+import os
+
+from solver import solve_to_file
+from tournament import *
+
+
+def test_lopsided_match_stops_early(tmp_path):
+    q_path = str(tmp_path / 'solved.pkl')
+    solve_to_file(q_path, opponent='random')
+    before = os.path.getmtime(q_path)
+
+    result = evaluate(q_path, 'random', num_games=2000, batch_size=20, seed=1)
+    assert result['sprt']['decision'] == 'H1'
+    assert result['stopped_early']
+    assert result['games'] == result['wins'] + result['draws'] + result['losses']
+    low, high = result['win_ci']
+    assert low <= result['win_rate'] <= high and low > 0.8
+    assert os.path.getmtime(q_path) == before
+
+    reverse = evaluate('random', q_path, num_games=2000, batch_size=20, seed=1)
+    assert reverse['sprt']['decision'] == 'H0'
+
+
+def test_results_do_not_depend_on_worker_count():
+    serial = evaluate('random', 'random', num_games=60, num_workers=1, batch_size=20, seed=3, sprt=False)
+    parallel = evaluate('random', 'random', num_games=60, num_workers=2, batch_size=20, seed=3, sprt=False)
+    for key in ('games', 'wins', 'draws', 'losses'):
+        assert serial[key] == parallel[key]
+    assert serial['games'] == 60 and not serial['stopped_early']
+
+
+def test_wilson_interval():
+    assert wilson_interval(0, 0) == (0.0, 1.0)
+    low, high = wilson_interval(50, 100)
+    assert abs((low + high) / 2 - 0.5) < 1e-9 and 0.39 < low < 0.41
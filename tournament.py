@@ -0,0 +1,184 @@
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import random
+import time
+
+from opponents import *
+
+# Read-only evaluation between two policies.
+#
+# A policy is anything with select_action(state, action_ids), or a spec string:
+#   'random'           uniform random legal moves
+#   'solver:minimax'   greedy policy of solver.solve(opponent='minimax') (also 'solver:random')
+#   'search:minimax'   SearchPlayer with the default time budget (also 'search:expectimax')
+#   'path/to/q.pkl'    greedy policy of a saved Q-table (pickle or shared_q.py export,
+#                      symmetric tables are recognized from the file)
+#                      or a policy.py compiled policy file
+# Q-tables are compiled into greedy lookups once and never written to.
+#
+# Game i puts policy A in seat i % 2, like training alternates evaluated_player.
+# Games are played in fixed batches seeded from (seed, batch), so results depend
+# only on the arguments, not on the number of workers. With sprt=True the match
+# stops as soon as a sequential probability ratio test on the decisive games
+# settles whether A scores above p1 or below p0 against B.
+#
+#   python tournament.py q_table.pkl random --games 2000 --workers 4
+
+Z_95 = 1.959964
+
+
+def load_policy(spec, symmetric=None):
+    if not isinstance(spec, str):
+        return spec
+    if spec == 'random':
+        return RandomOpponent()
+    if spec.startswith('solver:'):
+        from solver import solve
+        Q, _ = solve(opponent=spec.split(':', 1)[1])
+        return GreedyOpponent.from_q_table(Q, spec)
+    if spec.startswith('search:'):
+        from search import SearchPlayer
+        return SearchPlayer(mode=spec.split(':', 1)[1], name=spec)
+    if not os.path.exists(spec):
+        raise ValueError(f"Unknown policy: {spec} (expected 'random', 'solver:<model>', 'search:<mode>' or a Q-table file)")
+    return GreedyOpponent.from_file(spec, symmetric)
+
+
+def play_game(policy_a, policy_b, a_player, max_turns=300):
+    # 1 if A wins, 0 for a draw (turn limit), -1 if A loses
+    game = Game()
+    game.reset(evaluated_player=a_player)
+    turn = 0
+    while True:
+        state = game.game_state()
+        action_ids = get_valid_action_ids(state)
+        if not action_ids:
+            return 0
+        policy = policy_a if game.current_player == a_player else policy_b
+        game.apply_action(ID_TO_ACTION[policy.select_action(state, action_ids)])
+        if game.is_done():
+            return 1 if game.get_winner() == a_player else -1
+        if turn > max_turns:
+            return 0
+        turn += 1
+
+
+def wilson_interval(successes, trials, z=Z_95):
+    if trials == 0:
+        return (0.0, 1.0)
+    p = successes / trials
+    denominator = 1 + z * z / trials
+    center = (p + z * z / (2 * trials)) / denominator
+    margin = z * math.sqrt(p * (1 - p) / trials + z * z / (4 * trials * trials)) / denominator
+    return (max(0.0, center - margin), min(1.0, center + margin))
+
+
+def sprt_llr(wins, losses, p0=0.45, p1=0.55):
+    # log-likelihood ratio of H1 (A wins a decisive game with probability p1) over H0 (p0)
+    return wins * math.log(p1 / p0) + losses * math.log((1 - p1) / (1 - p0))
+
+
+def sprt_bounds(alpha=0.05, beta=0.05):
+    return math.log(beta / (1 - alpha)), math.log((1 - beta) / alpha)
+
+
+_WORKER = {}
+
+
+def _init_worker(policy_a, policy_b, max_turns):
+    _WORKER['policies'] = (policy_a, policy_b)
+    _WORKER['max_turns'] = max_turns
+    if not LEGAL_MOVES:
+        load_legal_move_table()
+
+
+def _play_batch(task):
+    first_game, count, seed = task
+    policy_a, policy_b = _WORKER['policies']
+    # string seeds go through sha512, so a batch plays the same in any process
+    random.seed(seed)
+    return [play_game(policy_a, policy_b, game % 2, _WORKER['max_turns'])
+            for game in range(first_game, first_game + count)]
+
+
+def evaluate(policy_a, policy_b, num_games=1000, num_workers=1, batch_size=50, seed=0, max_turns=300,
+             sprt=True, p0=0.45, p1=0.55, alpha=0.05, beta=0.05, symmetric=None):
+    started = time.perf_counter()
+    policy_a = load_policy(policy_a, symmetric)
+    policy_b = load_policy(policy_b, symmetric)
+    tasks = [(first, min(batch_size, num_games - first), f"{seed}:{first // batch_size}")
+             for first in range(0, num_games, batch_size)]
+    lower, upper = sprt_bounds(alpha, beta)
+
+    wins = draws = losses = 0
+    llr = 0.0
+    decision = None
+    pool = None
+    if num_workers > 1:
+        pool = multiprocessing.get_context().Pool(num_workers, _init_worker, (policy_a, policy_b, max_turns))
+        batches = pool.imap(_play_batch, tasks)
+    else:
+        _init_worker(policy_a, policy_b, max_turns)
+        batches = map(_play_batch, tasks)
+    try:
+        # batches are consumed in order, so an early stop lands on the same game every run
+        for outcomes in batches:
+            for outcome in outcomes:
+                wins += outcome == 1
+                draws += outcome == 0
+                losses += outcome == -1
+            if sprt:
+                llr = sprt_llr(wins, losses, p0, p1)
+                if llr >= upper:
+                    decision = 'H1'
+                elif llr <= lower:
+                    decision = 'H0'
+                if decision is not None:
+                    break
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+
+    games = wins + draws + losses
+    return {
+        'policy_a': getattr(policy_a, 'name', type(policy_a).__name__),
+        'policy_b': getattr(policy_b, 'name', type(policy_b).__name__),
+        'games': games,
+        'wins': wins,
+        'draws': draws,
+        'losses': losses,
+        'win_rate': wins / games if games else 0.0,
+        'win_ci': wilson_interval(wins, games),
+        'draw_ci': wilson_interval(draws, games),
+        'loss_ci': wilson_interval(losses, games),
+        'score': (wins + 0.5 * draws) / games if games else 0.0,
+        'sprt': {'llr': llr, 'bounds': (lower, upper), 'p0': p0, 'p1': p1, 'decision': decision} if sprt else None,
+        'stopped_early': games < num_games,
+        'seconds': time.perf_counter() - started,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Play two policies against each other without modifying them.')
+    parser.add_argument('policy_a')
+    parser.add_argument('policy_b')
+    parser.add_argument('--games', type=int, default=1000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--batch-size', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-sprt', action='store_true', help='always play all games')
+    parser.add_argument('--symmetric', action='store_true',
+                        help='Q-tables that do not record it were trained with symmetric=True')
+    args = parser.parse_args(argv)
+
+    result = evaluate(args.policy_a, args.policy_b, args.games, args.workers, args.batch_size, args.seed,
+                      sprt=not args.no_sprt, symmetric=args.symmetric or None)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+import os
+
+import numpy as np
+
+from game import *
+
+# Binary trajectory files: a 16 byte header followed by fixed-width records,
+# one per move, both players, in play order.
+#
+#   state   uint32   state_to_index(game_state()) before the move
+#   action  uint8    action id
+#   reward  float32  from the mover's point of view: 1 win, -1 loss, 0 otherwise
+#   done    uint8    1 on the last move of an episode (including turn-limit draws)
+#
+# Records are 10 bytes, so 100M moves is about 1 GB. TrajectoryReader memory-maps
+# the file and hands out chunks, nothing is read until it is touched. A record
+# cut short by a crash is ignored by the reader and dropped by the next recorder.
+#
+#   with TrajectoryRecorder('games.traj') as recorder:
+#       Agent(recorder=recorder).train_q_learning(10000)
+#   for chunk in TrajectoryReader('games.traj').iter_chunks(): ...
+
+TRAJECTORY_MAGIC = b'SGTRAJ\x00\x01'
+TRAJECTORY_HEADER_SIZE = 16
+TRAJECTORY_DTYPE = np.dtype([('state', '<u4'), ('action', 'u1'), ('reward', '<f4'), ('done', 'u1')])
+
+
+def _header():
+    return TRAJECTORY_MAGIC.ljust(TRAJECTORY_HEADER_SIZE, b'\x00')
+
+
+def _check_header(path):
+    with open(path, 'rb') as f:
+        header = f.read(TRAJECTORY_HEADER_SIZE)
+    if header != _header():
+        raise ValueError(f"Not a trajectory file: {path}")
+
+
+class TrajectoryRecorder:
+    def __init__(self, path='trajectories.traj', chunk_size=65536):
+        # appends to an existing file, records are buffered and written chunk_size at a time
+        self.path = path
+        self.buffer = np.zeros(chunk_size, dtype=TRAJECTORY_DTYPE)
+        self.count = 0
+        self.written = 0
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            _check_header(path)
+            size = os.path.getsize(path) - TRAJECTORY_HEADER_SIZE
+            self.written = size // TRAJECTORY_DTYPE.itemsize
+            if size % TRAJECTORY_DTYPE.itemsize:
+                # torn tail from an interrupted write
+                with open(path, 'r+b') as f:
+                    f.truncate(TRAJECTORY_HEADER_SIZE + self.written * TRAJECTORY_DTYPE.itemsize)
+        else:
+            with open(path, 'wb') as f:
+                f.write(_header())
+
+    def record(self, state_index, action_id, reward, done):
+        record = self.buffer[self.count]
+        record['state'] = state_index
+        record['action'] = action_id
+        record['reward'] = reward
+        record['done'] = done
+        self.count += 1
+        if self.count == len(self.buffer):
+            self.flush()
+
+    def flush(self):
+        if self.count == 0:
+            return
+        with open(self.path, 'ab') as f:
+            f.write(self.buffer[:self.count].tobytes())
+        self.written += self.count
+        self.count = 0
+
+    def extend(self, records):
+        # appends a TRAJECTORY_DTYPE array after everything recorded so far
+        self.flush()
+        records = np.asarray(records, dtype=TRAJECTORY_DTYPE)
+        if len(records):
+            with open(self.path, 'ab') as f:
+                f.write(records.tobytes())
+            self.written += len(records)
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self.written + self.count
+
+
+class TrajectoryBuffer:
+    # in-memory stand-in for TrajectoryRecorder (same record()), used by parallel
+    # training workers; take() hands over the records so far for TrajectoryRecorder.extend
+    def __init__(self):
+        self.records = []
+
+    def record(self, state_index, action_id, reward, done):
+        self.records.append((state_index, action_id, reward, done))
+
+    def take(self):
+        records = np.array(self.records, dtype=TRAJECTORY_DTYPE)
+        self.records = []
+        return records
+
+    def __len__(self):
+        return len(self.records)
+
+
+class TrajectoryReader:
+    def __init__(self, path='trajectories.traj'):
+        _check_header(path)
+        self.path = path
+        count = (os.path.getsize(path) - TRAJECTORY_HEADER_SIZE) // TRAJECTORY_DTYPE.itemsize
+        if count:
+            self.records = np.memmap(path, dtype=TRAJECTORY_DTYPE, mode='r',
+                                     offset=TRAJECTORY_HEADER_SIZE, shape=(count,))
+        else:
+            # np.memmap refuses empty maps
+            self.records = np.zeros(0, dtype=TRAJECTORY_DTYPE)
+
+    def __len__(self):
+        return len(self.records)
+
+    def iter_chunks(self, chunk_size=1 << 20):
+        # read-only structured views into the map
+        for start in range(0, len(self.records), chunk_size):
+            yield self.records[start:start + chunk_size]
+
+    def iter_episodes(self, chunk_size=1 << 20):
+        # one structured array per finished episode; an unfinished tail is not yielded
+        pending = []
+        for chunk in self.iter_chunks(chunk_size):
+            ends = np.flatnonzero(chunk['done']) + 1
+            start = 0
+            for end in ends.tolist():
+                pending.append(chunk[start:end])
+                yield np.concatenate(pending) if len(pending) > 1 else pending[0]
+                pending = []
+                start = end
+            if start < len(chunk):
+                pending.append(chunk[start:])
+
+    def stats(self, chunk_size=1 << 20):
+        steps = 0
+        episodes = 0
+        wins = 0
+        action_counts = np.zeros(256, dtype=np.int64)
+        for chunk in self.iter_chunks(chunk_size):
+            steps += len(chunk)
+            done = chunk['done'].astype(bool)
+            episodes += int(done.sum())
+            wins += int((chunk['reward'][done] > 0).sum())
+            action_counts += np.bincount(chunk['action'], minlength=256)
+        return {
+            'steps': steps,
+            'episodes': episodes,
+            'decided_episodes': wins,
+            'mean_episode_length': steps / episodes if episodes else 0.0,
+            'action_counts': action_counts[:int(np.flatnonzero(action_counts).max()) + 1].tolist() if steps else [],
+        }